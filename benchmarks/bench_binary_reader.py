@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+import numpy as np
+
+from src.common.parser.resource_parser import ResourceParser
+from src.common.util.binary_reader import BinaryReader
+
+
+# the previous numpy based scalar path, kept here for comparison
+class NumpyBinaryReader(BinaryReader):
+    def read_numpy_scalar(self, fmt):
+        dt = np.dtype(fmt).newbyteorder(self.endianness)
+        self.check_offset(self.offset + dt.itemsize)
+        value = np.frombuffer(self.data, dt, 1, self.offset)
+        self.offset += dt.itemsize
+        return value[0]
+
+    def read_scalar(self, fmt):
+        return self.read_numpy_scalar(fmt)
+
+
+class CountingBuilder:
+    def __init__(self):
+        self.root = None
+        self.depth = 1
+        self.fields = 0
+
+    def start_block(self, key=None):
+        self.depth += 1
+        self.fields += 1
+
+    def finish_block(self):
+        self.depth -= 1
+        self.fields += 1
+
+    def add_value(self, *args, **kwargs):
+        self.fields += 1
+
+    def add_array(self, *args, **kwargs):
+        self.fields += 1
+
+    def infer_arrays(self, data, header_size):
+        self.root = self.fields
+
+    def finished(self):
+        return self.depth == 0
+
+
+def bench(reader_cls, data, repeat):
+    best = None
+    fields = 0
+    for _ in range(repeat):
+        parser = ResourceParser(None)
+        parser.reader = reader_cls(data)
+        start = time.perf_counter()
+        fields = parser.parse(CountingBuilder)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, fields
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare per-field decoding cost of BinaryReader backends")
+    parser.add_argument("input", help="resource file (.scn, .mesh)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        data = f.read()
+
+    for name, reader_cls in [("numpy", NumpyBinaryReader), ("struct", BinaryReader)]:
+        elapsed, fields = bench(reader_cls, data, args.repeat)
+        print(f"{name:>8}: {fields} fields in {elapsed * 1000:.1f} ms, {elapsed / fields * 1e6:.3f} us/field")
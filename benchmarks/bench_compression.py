@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+from src.common.parser.lns_parser import LnsParser
+from src.tools.lns_tool import make_compressor
+
+LEVELS = [1, 3, 9, 15, 19]
+THREADS = [0, -1]
+
+
+def load_payload(filename):
+    files = LnsParser(filename).parse()
+    return b"".join(files.values())
+
+
+def bench(payload, level, threads, long_distance, repeat):
+    best = None
+    compressed = None
+    for _ in range(repeat):
+        cctx = make_compressor(level, threads, long_distance)
+        start = time.perf_counter()
+        compressed = cctx.compress(payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(compressed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Report zstd compression ratio against wall time for lens payloads")
+    parser.add_argument("input", nargs="+", help="lens archives")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of runs, the best one is reported")
+    parser.add_argument("-l", "--levels", type=int, nargs="+", default=LEVELS, help="compression levels to test")
+    args = parser.parse_args()
+
+    for filename in args.input:
+        payload = load_payload(filename)
+        print(f"{filename}: {len(payload)} bytes uncompressed")
+        print(f"{'level':>6} {'threads':>8} {'long':>5} {'ratio':>8} {'time ms':>9} {'MB/s':>8}")
+        for level in args.levels:
+            for threads in THREADS:
+                for long_distance in (False, True):
+                    elapsed, size = bench(payload, level, threads, long_distance, args.repeat)
+                    ratio = len(payload) / size if size else 0
+                    speed = len(payload) / elapsed / 1e6
+                    print(f"{level:>6} {threads:>8} {str(long_distance):>5} {ratio:>8.3f} {elapsed * 1000:>9.1f} {speed:>8.1f}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.tools.hash_tool import calc_hash, hash_combine, hash_files
+
+
+# the previous numpy scalar implementation, kept here for comparison
+def legacy_calc_hash(data):
+    dt = np.uint64
+    dtype = np.dtype(dt).newbyteorder("<")
+    padding = bytes(8 - (len(data) % 8))
+
+    np.seterr(over="ignore")
+    h = dt(0)
+    for n in np.frombuffer(data + padding, dtype):
+        h = hash_combine(h, n, dt)
+    h = hash_combine(h, dt(len(data)), dt)
+    np.seterr(over="warn")
+
+    return h
+
+
+def bench(fn, arg, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare calc_hash against the previous numpy implementation")
+    parser.add_argument("input", nargs="+", help="files to hash")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of runs, the best one is reported")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes for the batch run")
+    args = parser.parse_args()
+
+    total = 0
+    for filename in args.input:
+        with open(filename, "rb") as f:
+            data = f.read()
+        total += len(data)
+        legacy_time, legacy = bench(legacy_calc_hash, data, args.repeat)
+        fast_time, fast = bench(calc_hash, data, args.repeat)
+        if legacy != fast:
+            raise AssertionError(f"Hash mismatch for {filename}: {legacy} != {fast}")
+        mb = len(data) / 1e6
+        print(f"{filename}: {len(data)} bytes, legacy {legacy_time * 1000:.1f} ms ({mb / legacy_time:.1f} MB/s), "
+              f"fast {fast_time * 1000:.1f} ms ({mb / fast_time:.1f} MB/s), {legacy_time / fast_time:.1f}x")
+
+    if len(args.input) > 1:
+        for jobs in sorted({1, args.jobs or os.cpu_count() or 1}):
+            elapsed, _ = bench(lambda filenames: hash_files(filenames, jobs), args.input, args.repeat)
+            print(f"batch of {len(args.input)} files with {jobs} workers: {elapsed * 1000:.1f} ms "
+                  f"({total / 1e6 / elapsed:.1f} MB/s)")
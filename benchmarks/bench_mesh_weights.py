@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+import numpy as np
+
+from src.common.parser.mesh_parser import Bone, Mesh, MeshParser
+
+
+# the previous per vertex implementation, kept here for comparison
+def legacy_assign_weights(mesh, rgroups_json):
+    indices_flat = np.array(mesh.indices).flat
+    dups = set()
+    for rgroup_json in rgroups_json.values():
+        index_offset = rgroup_json["indexOffset"]
+        index_count = rgroup_json["indexCount"]
+        bonesremaping = list(rgroup_json["bonesremaping"].values())
+        for index in np.unique(indices_flat[index_offset:index_offset + index_count]):
+            for bone_data in mesh.vertices["boneData"][index]:
+                weight = bone_data - np.floor(bone_data)
+                bone_map_index = int(bone_data)
+                bone_index = bonesremaping[bone_map_index]["boneIndex"]
+                if weight != 0 and bone_index != 0 and (bone_index, index) not in dups:
+                    dups.add((bone_index, index))
+                    mesh.bones[bone_index].weights.append(weight)
+                    mesh.bones[bone_index].indices.append(index)
+
+
+# rgroups overlap and reference bone 0 and zero weights, so the skip and first assignment rules are covered
+def make_mesh(num_verts, num_faces, num_bones, num_groups, seed):
+    rng = np.random.default_rng(seed)
+    mesh = Mesh()
+    remap_size = 8
+    bone_map = rng.integers(0, remap_size, (num_verts, 4))
+    weights = rng.choice(np.array([0, 0.125, 0.25, 0.5, 0.75], dtype=np.float32), (num_verts, 4))
+    mesh.vertices["boneData"] = (bone_map + weights).astype(np.float32)
+    mesh.indices = rng.integers(0, num_verts, (num_faces, 3)).astype(np.uint16)
+    mesh.bones = [Bone(f"bone{i}", np.eye(4)) for i in range(num_bones)]
+
+    rgroups_json = {}
+    index_count = num_faces * 3
+    for i in range(num_groups):
+        start = int(rng.integers(0, index_count))
+        remap = rng.integers(0, num_bones, remap_size)
+        rgroups_json[str(i)] = {
+            "indexOffset": start,
+            "indexCount": int(rng.integers(0, index_count - start + 1)),
+            "bonesremaping": {str(j): {"boneIndex": int(bone_index)} for j, bone_index in enumerate(remap)}
+        }
+    return mesh, rgroups_json
+
+
+def fresh_bones(mesh, legacy):
+    for bone in mesh.bones:
+        bone.indices = [] if legacy else np.empty(0, dtype=np.uint16)
+        bone.weights = [] if legacy else np.empty(0, dtype=np.float32)
+
+
+def timed(fn, mesh, rgroups_json):
+    start = time.perf_counter()
+    fn(mesh, rgroups_json)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check assign_weights against the previous implementation")
+    parser.add_argument("-v", "--verts", type=int, default=20000, help="number of vertices")
+    parser.add_argument("-b", "--bones", type=int, default=40, help="number of bones")
+    parser.add_argument("-g", "--groups", type=int, default=4, help="number of rgroups")
+    parser.add_argument("-s", "--seeds", type=int, default=5, help="number of random meshes")
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        mesh, rgroups_json = make_mesh(args.verts, args.verts, args.bones, args.groups, seed)
+        fresh_bones(mesh, True)
+        legacy_time = timed(legacy_assign_weights, mesh, rgroups_json)
+        legacy = [(list(bone.indices), list(bone.weights)) for bone in mesh.bones]
+        fresh_bones(mesh, False)
+        fast_time = timed(MeshParser.assign_weights, mesh, rgroups_json)
+
+        for i, (bone, (indices, weights)) in enumerate(zip(mesh.bones, legacy)):
+            if not np.array_equal(bone.indices, indices) or not np.array_equal(bone.weights, weights):
+                raise AssertionError(f"Weights differ for bone {i} of mesh {seed}")
+        print(f"mesh {seed}: {sum(len(indices) for indices, _ in legacy)} weights, "
+              f"legacy {legacy_time * 1000:.1f} ms, fast {fast_time * 1000:.1f} ms, {legacy_time / fast_time:.1f}x")
+
+    mesh, rgroups_json = make_mesh(100, 100, args.bones, 1, 0)
+    rgroups_json["0"]["bonesremaping"]["1"]["boneIndex"] = args.bones
+    mesh.vertices["boneData"][mesh.indices[0, 0], 0] = 1.5
+    rgroups_json["0"].update(indexOffset=0, indexCount=3)
+    fresh_bones(mesh, False)
+    try:
+        MeshParser.assign_weights(mesh, rgroups_json)
+    except IndexError as e:
+        print(f"out of range bone index: {e}")
+    else:
+        raise AssertionError("Out of range bone index was not reported")
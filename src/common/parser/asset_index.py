@@ -0,0 +1,51 @@
+from collections import namedtuple
+
+# key is the position of the asset block inside "assets", block its parsed json
+AssetRef = namedtuple("AssetRef", ["key", "name", "type", "uid", "block"])
+
+
+class AssetIndex:
+    def __init__(self):
+        self.assets = []
+        self.uids = {}
+        self.names = {}
+        self.types = {}
+
+    @classmethod
+    def from_json(cls, assets_json):
+        index = cls()
+        for key, asset_json in assets_json.items():
+            index.add(key, asset_json)
+        return index
+
+    def __len__(self):
+        return len(self.assets)
+
+    def __contains__(self, uid):
+        return uid in self.uids
+
+    def add(self, key, asset_json):
+        ref = AssetRef(key, asset_json.get("name"), asset_json.get("type"), asset_json.get("uid"), asset_json)
+        self.assets.append(ref)
+        if ref.uid is not None:
+            self.uids.setdefault(ref.uid, ref)
+        self.names.setdefault(ref.name, []).append(ref)
+        self.types.setdefault(ref.type, []).append(ref)
+        return ref
+
+    def by_uid(self, uid):
+        return self.uids.get(uid)
+
+    def by_name(self, name):
+        return self.names.get(name, [])
+
+    def by_type(self, type):
+        return self.types.get(type, [])
+
+    # fileinfo path of the first asset with the given name, e.g. "Scripts/LensModeController.js"
+    def file_path(self, name):
+        for ref in self.by_name(name):
+            fileinfo = ref.block.get("fileinfo")
+            if isinstance(fileinfo, dict) and "path" in fileinfo:
+                return fileinfo["path"]
+        return None
@@ -0,0 +1,120 @@
+import zstandard as zstd
+
+from .exceptions import ParserException
+from ..util.binary_reader import BinaryReader
+
+
+class LnsEntry:
+    def __init__(self, path, size, offset):
+        self.path = path
+        self.size = size
+        self.offset = offset
+
+
+# random access reader, the payload is only decompressed up to the furthest entry requested
+class LnsArchive:
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, filename, data=None, use_mmap=False):
+        self.filename = filename
+        self.reader = data and BinaryReader(data)
+        self.use_mmap = use_mmap
+        self.entries = {}
+        self.compressed_offset = None
+        self.compressed_size = None
+        self.uncompressed_size = None
+        self._decompressor = None
+        self._input_offset = 0
+        self._buffer = bytearray()
+        self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, path):
+        return self.read(path)
+
+    def open(self):
+        if self.reader is None:
+            self.reader = BinaryReader.from_file(self.filename, self.use_mmap)
+
+        magic = self.reader.read_bytes(4)
+        if magic != b"LZC\0":
+            raise ParserException("Unexpected magic number")
+        self.reader.skip(4)
+        file_count = self.reader.read_uint32()
+        header_size = self.reader.read_uint32()
+        self.reader.skip(8)
+        self.uncompressed_size = self.reader.read_uint32()
+
+        self.reader.seek(header_size + 4)
+        self.compressed_size = self.reader.read_uint32()
+        self.compressed_offset = self.reader.offset
+        self.reader.check_offset(self.compressed_offset + self.compressed_size)
+
+        self.reader.seek(0x48)
+        for _ in range(file_count):
+            path_len = self.reader.read_uint32()
+            file_path = self.reader.read_string(path_len)
+            self.reader.skip(4)
+            file_size = self.reader.read_uint32()
+            file_offset = self.reader.read_uint32()
+            self.entries[file_path] = LnsEntry(file_path, file_size, file_offset)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        self._decompressor = None
+        self._buffer = bytearray()
+
+    def namelist(self):
+        return list(self.entries)
+
+    def get_entry(self, path):
+        if path not in self.entries:
+            raise KeyError(f"No such file in archive: {path}")
+        return self.entries[path]
+
+    def read(self, path):
+        entry = self.get_entry(path)
+        end = entry.offset + entry.size
+        self._decompress_until(end)
+        if len(self._buffer) < end:
+            raise ParserException(f"Truncated archive data for {path}")
+        # the buffer keeps growing, so entries are returned as copies
+        with memoryview(self._buffer) as view:
+            return bytes(view[entry.offset:end])
+
+    # zero-copy view of the compressed payload, release it when done with it
+    def compressed_view(self):
+        self.reader.seek(self.compressed_offset)
+        return self.reader.read_bytes(self.compressed_size)
+
+    def read_all(self):
+        return {path: self.read(path) for path in self.entries}
+
+    def _decompress_until(self, end):
+        if self._decompressor is None:
+            self._decompressor = zstd.ZstdDecompressor().decompressobj()
+            self._input_offset = self.compressed_offset
+
+        compressed_end = self.compressed_offset + self.compressed_size
+        while len(self._buffer) < end and self._input_offset < compressed_end:
+            chunk_end = min(self._input_offset + self.CHUNK_SIZE, compressed_end)
+            self.reader.seek(self._input_offset)
+            with self.reader.read_bytes(chunk_end - self._input_offset) as chunk:
+                self._buffer += self._decompressor.decompress(chunk)
+            self._input_offset = chunk_end
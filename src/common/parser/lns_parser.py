@@ -5,15 +5,26 @@ from ..util.binary_reader import BinaryReader
 
 
 class LnsParser:
-    def __init__(self, filename, data=None):
+    def __init__(self, filename, data=None, use_mmap=False):
         self.filename = filename
         self.reader = data and BinaryReader(data)
+        self.use_mmap = use_mmap
 
-    def parse(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    # entries are views into one decompressed buffer unless copy is set
+    def parse(self, copy=False):
         if self.reader is None:
-            with open(self.filename, "rb") as f:
-                data = f.read()
-            self.reader = BinaryReader(data)
+            self.reader = BinaryReader.from_file(self.filename, self.use_mmap)
 
         magic = self.reader.read_bytes(4)
         if magic != b"LZC\0":
@@ -24,9 +35,9 @@ class LnsParser:
 
         self.reader.seek(header_size + 4)
         compressed_size = self.reader.read_uint32()
-        zstd_data = self.reader.read_bytes(compressed_size)
         dctx = zstd.ZstdDecompressor()
-        zstd_reader = BinaryReader(dctx.decompress(zstd_data))
+        with self.reader.read_bytes(compressed_size) as zstd_data:
+            zstd_reader = BinaryReader(dctx.decompress(zstd_data))
 
         files = {}
         self.reader.seek(0x48)
@@ -37,6 +48,7 @@ class LnsParser:
             file_size = self.reader.read_uint32()
             file_offset = self.reader.read_uint32()
             zstd_reader.seek(file_offset)
-            files[file_path] = zstd_reader.read_bytes(file_size)
+            file_data = zstd_reader.read_bytes(file_size)
+            files[file_path] = bytes(file_data) if copy else file_data
 
         return files
@@ -9,14 +9,14 @@ class Bone:
     def __init__(self, name, invmat):
         self.name = name
         self.invmat = invmat
-        self.indices = []
-        self.weights = []
+        self.indices = np.empty(0, dtype=np.uint16)
+        self.weights = np.empty(0, dtype=np.float32)
 
 
 class Mesh:
     def __init__(self):
-        self.vertices = {}
-        self.indices = []
+        self.vertices = {}  # semantic => (num_verts, component_count) column view
+        self.indices = np.empty((0, 3), dtype=np.uint16)
         self.bones = []
 
 
@@ -30,40 +30,77 @@ class MeshParser(ResourceParser):
         num_verts = len(reader.data) // np.dtype(vert_dtype).itemsize
         parsed_verts = reader.read(vert_dtype, num_verts)
         mesh = Mesh()
-        for i, attr in zip(range(len(attributes)), attributes):
-            mesh.vertices[attr["semantic"]] = [vert[i] for vert in parsed_verts]
+        for attr in attributes:
+            mesh.vertices[attr["semantic"]] = parsed_verts[attr["semantic"]]
 
         # faces
-        face_dtype = [("face", ("H", 3))]
         reader = BinaryReader(json["indices"].as_bytes())
-        num_faces = len(reader.data) // np.dtype(face_dtype).itemsize
-        parsed_faces = reader.read(face_dtype, num_faces)
-        mesh.indices = [face[0] for face in parsed_faces]
+        num_faces = len(reader.data) // np.dtype(("H", 3)).itemsize
+        mesh.indices = reader.read("H", num_faces * 3).reshape(num_faces, 3)
 
         # bones
-        for i in range(len(json["skinbones"])):
-            bone_json = json["skinbones"][i]
+        for bone_json in json["skinbones"].values():
             invmat = bone_json["invtm"].reshape(4, 4, order="F")
             bone = Bone(bone_json["boneName"], invmat)
             mesh.bones.append(bone)
 
         if "rgroups" in json:
-            indices_flat = np.array(mesh.indices).flat
-        dups = set()
-        for rgroup_json in json["rgroups"].values():
+            MeshParser.assign_weights(mesh, json["rgroups"])
+
+        return mesh
+
+    # each boneData component packs a bonesremaping index in its integer part and the weight in its fraction.
+    # a vertex is assigned to a bone once, by the first rgroup and component referencing it.
+    def assign_weights(mesh, rgroups_json):
+        indices_flat = mesh.indices.reshape(-1)
+        bone_data = mesh.vertices["boneData"]
+        num_verts = len(bone_data)
+
+        bone_parts = []
+        index_parts = []
+        weight_parts = []
+        seen = np.zeros(0, dtype=np.int64)
+        for rgroup_json in rgroups_json.values():
             index_offset = rgroup_json["indexOffset"]
             index_count = rgroup_json["indexCount"]
-            for index in np.unique(indices_flat[index_offset:index_offset + index_count]):
-                for bone_data in mesh.vertices["boneData"][index]:
-                    weight = bone_data - np.floor(bone_data)
-                    bone_map_index = int(bone_data)
-                    bone_index = rgroup_json["bonesremaping"][bone_map_index]["boneIndex"]
-                    if weight != 0 and bone_index != 0 and (bone_index, index) not in dups:
-                        dups.add((bone_index, index))
-                        mesh.bones[bone_index].weights.append(weight)
-                        mesh.bones[bone_index].indices.append(index)
+            remap = np.array([remap_json["boneIndex"] for remap_json in rgroup_json["bonesremaping"].values()],
+                             dtype=np.int64)
 
-        return mesh
+            indices = np.unique(indices_flat[index_offset:index_offset + index_count])
+            group_data = bone_data[indices]
+            weights = group_data - np.floor(group_data)
+            bone_indices = remap[group_data.astype(np.int64)]
+
+            # row-major flattening keeps the (index, component) order of the assignments
+            mask = (weights != 0) & (bone_indices != 0)
+            bone_indices = bone_indices[mask]
+            indices = np.broadcast_to(indices[:, None], mask.shape)[mask]
+            weights = weights[mask]
+            if bone_indices.max(initial=0) >= len(mesh.bones):
+                raise IndexError(f"Bone index {bone_indices.max()} out of range for {len(mesh.bones)} bones")
+
+            keys = bone_indices * num_verts + indices
+            _, first = np.unique(keys, return_index=True)
+            first.sort()
+            first = first[~np.isin(keys[first], seen)]
+            seen = np.concatenate((seen, keys[first]))
+
+            bone_parts.append(bone_indices[first])
+            index_parts.append(indices[first])
+            weight_parts.append(weights[first])
+
+        if not bone_parts:
+            return
+
+        bone_indices = np.concatenate(bone_parts)
+        indices = np.concatenate(index_parts)
+        weights = np.concatenate(weight_parts)
+        order = np.argsort(bone_indices, kind="stable")
+        bone_indices = bone_indices[order]
+        bounds = np.searchsorted(bone_indices, np.arange(len(mesh.bones) + 1))
+        for bone, start, end in zip(mesh.bones, bounds[:-1], bounds[1:]):
+            bone.indices = indices[order[start:end]]
+            bone.weights = weights[order[start:end]]
 
     # create numpy dtype from mesh vertexlayout.
     # return dtype and attributes json sorted by index
@@ -1,8 +1,127 @@
+from array import array
+from collections import namedtuple
+
 import numpy as np
 
-from ..types.enums import FieldType
+from ..types.enums import EventType, FieldType, field_type_to_symbol
 from ..util.binary_reader import BinaryReader
 
+field_type_to_tag = {
+    FieldType.BOOL: ("bool8", None),
+    FieldType.DOUBLE: ("float64", None),
+    FieldType.FLOAT: ("float32", None),
+    FieldType.INT32: ("int32", None),
+    FieldType.INT64: ("int64", None),
+    FieldType.MAT2: ("mat2f", "float32"),
+    FieldType.MAT3: ("mat3f", "float32"),
+    FieldType.MAT4: ("mat4f", "float32"),
+    FieldType.QUAT: ("quatf", "float32"),
+    FieldType.STRING: ("string", None),
+    FieldType.STRINGV1: ("string", None),
+    FieldType.UINT32: ("uint32", None),
+    FieldType.UINT64: ("uint64", None),
+    FieldType.VEC2F: ("vec2f", "float32"),
+    FieldType.VEC3F: ("vec3f", "float32"),
+    FieldType.VEC4F: ("vec4f", "float32"),
+    FieldType.VEC4B: ("vec4b", "int8")
+}
+
+tag_to_field_type = {tag: field_type for field_type, (tag, _) in field_type_to_tag.items()}
+tag_to_field_type["string"] = FieldType.STRING
+
+# offset is the position of the value payload, or of the field tag for BEGIN and END, so seeking to the
+# offset of a BEGIN event reads the block again from its start.
+# for ARRAY events size is the element count and value the offset into the array section.
+ResourceEvent = namedtuple("ResourceEvent", ["type", "label", "field_type", "offset", "size", "value"])
+
+# a value together with the field type it is stored as, see TypedResourceBuilder
+TypedValue = namedtuple("TypedValue", ["field_type", "value"])
+
+
+class ResourceEventReader:
+    FIELD_TYPES = {field_type.value: field_type for field_type in FieldType}
+    PAYLOAD_SIZES = {field_type.value: np.dtype(symbol).itemsize * count
+                     for field_type, (symbol, count) in field_type_to_symbol.items()}
+    PAYLOAD_SIZES.update({FieldType.BEGIN.value: 0, FieldType.BYTES.value: 4, FieldType.STRING.value: 4})
+
+    # with decode_values unset fixed size values are skipped and their events carry None, the payload can
+    # still be read through the event offset. strings are always decoded.
+    def __init__(self, reader, version, strings=None, decode_values=True):
+        self.reader = reader
+        self.version = version
+        self.strings = strings
+        self.decode_values = decode_values
+        self.depth = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.depth < 0:
+            raise StopIteration
+
+        reader = self.reader
+        tag_offset = reader.offset
+        field_type = self.FIELD_TYPES.get(reader.read_uint16())
+        if field_type is None:
+            raise ValueError("Tag not recognized")
+        if field_type is FieldType.END:
+            self.depth -= 1
+            return ResourceEvent(EventType.END, None, field_type, tag_offset, 0, None)
+
+        if self.version == 1:
+            label_len = reader.read_uint32()
+            label = reader.read_string(label_len) if label_len > 0 else None
+        else:
+            label_index = reader.read_uint32()
+            label = self.strings[label_index - 1] if label_index > 0 else None
+        size = reader.read_uint32()
+        offset = reader.offset
+
+        if field_type is FieldType.BEGIN:
+            self.depth += 1
+            return ResourceEvent(EventType.BEGIN, label, field_type, tag_offset, size, None)
+        elif field_type is FieldType.BYTES:
+            return ResourceEvent(EventType.ARRAY, label, field_type, offset, size, reader.read_uint32())
+        elif field_type is FieldType.STRING:
+            value = self.strings[reader.read_uint32() - 1]
+        elif field_type is FieldType.STRINGV1:
+            value = reader.read_string(reader.read_uint32())
+        elif not self.decode_values:
+            reader.skip(self.PAYLOAD_SIZES[field_type.value])
+            value = None
+        else:
+            symbol, count = field_type_to_symbol[field_type]
+            value = reader.read_scalar(symbol) if count == 1 else reader.read(symbol, count)
+        return ResourceEvent(EventType.VALUE, label, field_type, offset, size, value)
+
+    # skip the rest of the block opened by the last BEGIN event, without decoding it.
+    # its END event is consumed as well.
+    def skip(self):
+        reader = self.reader
+        depth = 0
+        while True:
+            tag = reader.read_uint16()
+            if tag == FieldType.END.value:
+                if depth == 0:
+                    break
+                depth -= 1
+                continue
+            if tag not in self.PAYLOAD_SIZES and tag != FieldType.STRINGV1.value:
+                raise ValueError("Tag not recognized")
+            if self.version == 1:
+                reader.skip(reader.read_uint32())
+            else:
+                reader.skip(4)
+            reader.skip(4)
+            if tag == FieldType.BEGIN.value:
+                depth += 1
+            elif tag == FieldType.STRINGV1.value:
+                reader.skip(reader.read_uint32())
+            else:
+                reader.skip(self.PAYLOAD_SIZES[tag])
+        self.depth -= 1
+
 
 class JsonResourceBuilder:
     def __init__(self):
@@ -27,7 +146,7 @@ class JsonResourceBuilder:
         self.parent[key] = value
 
     def add_array(self, key, offset, size):
-        arr_data = ArrayData()
+        arr_data = ArrayData(count=size)
         self.parent[key] = arr_data
         self.arrays.append((offset, size, arr_data))
 
@@ -45,13 +164,28 @@ class JsonResourceBuilder:
         return len(self.stack) == 0
 
 
+# same tree as JsonResourceBuilder but values keep their field type, so it can be written back with
+# ResourceSerializer.write_tree
+class TypedResourceBuilder(JsonResourceBuilder):
+    def add_value(self, key, value, tag, *args):
+        self.parent[key] = TypedValue(tag_to_field_type[tag], value)
+
+
 class ArrayData:
-    def __init__(self, data=None):
+    # count is the element count stored with the field, the byte size for plain byte arrays
+    def __init__(self, data=None, count=None):
         self.data = data
+        self.count = count
 
     def as_bytes(self):
         return self.data
 
+    # data is usually a view into the whole resource, detach() copies it so the resource can be released
+    def detach(self):
+        if isinstance(self.data, memoryview):
+            self.data = self.data.tobytes()
+        return self
+
     def as_strings(self):
         reader = BinaryReader(self.data)
         strings = []
@@ -66,14 +200,196 @@ class ArrayData:
         return reader.read(dtype, count)
 
 
+# tree stored in flat parallel columns, one row per block, value or array. values are decoded from the
+# original buffer on access, so a parsed resource costs little more than its file size.
+class ColumnarResourceBuilder:
+    # field type code and payload byte size by tag, strings are stored in string_ids instead
+    TAG_CODES = {tag: (field_type.value, 0 if field_type is FieldType.STRING
+                       else ResourceEventReader.PAYLOAD_SIZES[field_type.value])
+                 for tag, field_type in tag_to_field_type.items()}
+    BEGIN = EventType.BEGIN.value
+    VALUE = EventType.VALUE.value
+    ARRAY = EventType.ARRAY.value
+    # only offsets and field types are kept, values are decoded from the buffer on access
+    decode_values = False
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.field_types = array("H")
+        self.parents = array("i")
+        self.labels = array("i")
+        self.offsets = array("I")
+        self.sizes = array("I")
+        self.string_ids = array("i")
+        self.strings = []
+        self.string_index = {}
+        self.arrays = []
+        self.root = None
+        self.parent = self._add_node(self.BEGIN, FieldType.BEGIN.value, -1, None, 0, 0)
+        self.stack = [self.parent]
+
+    def _intern(self, string):
+        if string is None:
+            return -1
+        index = self.string_index.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.string_index[string] = index
+            self.strings.append(string)
+        return index
+
+    def _add_node(self, kind, field_type, parent, key, offset, size, string_id=-1):
+        self.kinds.append(kind)
+        self.field_types.append(field_type)
+        self.parents.append(parent)
+        self.labels.append(self._intern(key))
+        self.offsets.append(offset)
+        self.sizes.append(size)
+        self.string_ids.append(string_id)
+        return len(self.kinds) - 1
+
+    def start_block(self, key=None):
+        block = self._add_node(self.BEGIN, FieldType.BEGIN.value, self.parent, key, 0, 0)
+        self.stack.append(self.parent)
+        self.parent = block
+
+    def finish_block(self):
+        self.parent = self.stack.pop()
+
+    def add_value(self, key, value, tag, sub_tag=None, offset=None):
+        field_type, size = self.TAG_CODES[tag]
+        string_id = self._intern(value) if tag == "string" else -1
+        self._add_node(self.VALUE, field_type, self.parent, key, offset, size, string_id)
+
+    def add_array(self, key, offset, size):
+        node = self._add_node(self.ARRAY, FieldType.BYTES.value, self.parent, key, offset, 0)
+        self.arrays.append((offset, size, node))
+
+    def infer_arrays(self, data, header_size):
+        self.arrays.sort(key=lambda x: x[0])
+        for (offset, size, node), i in zip(self.arrays, range(len(self.arrays))):
+            if i == len(self.arrays) - 1:
+                true_size = len(data) - header_size - offset
+            else:
+                true_size = self.arrays[i + 1][0] - offset
+            self.offsets[node] = header_size + offset
+            self.sizes[node] = true_size
+        self.root = ResourceTree(self, data)
+
+    def finished(self):
+        return len(self.stack) == 0
+
+
+class ResourceTree:
+    def __init__(self, builder, data):
+        self.kinds = np.frombuffer(builder.kinds, dtype=np.uint8)
+        self.field_types = np.frombuffer(builder.field_types, dtype=np.uint16)
+        self.parents = np.frombuffer(builder.parents, dtype=np.int32)
+        self.labels = np.frombuffer(builder.labels, dtype=np.int32)
+        self.offsets = np.frombuffer(builder.offsets, dtype=np.uint32)
+        self.sizes = np.frombuffer(builder.sizes, dtype=np.uint32)  # payload byte size, 0 for blocks and strings
+        self.string_ids = np.frombuffer(builder.string_ids, dtype=np.int32)
+        self.strings = builder.strings
+        self.string_index = builder.string_index
+        self.reader = BinaryReader(data)
+        self._child_order = None
+        self._child_bounds = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    # nodes are stored in pre-order, so grouping them by parent keeps children in file order
+    def children(self, node=0):
+        if self._child_order is None:
+            self._child_order = np.argsort(self.parents, kind="stable")
+            self._child_bounds = np.searchsorted(self.parents[self._child_order], np.arange(-1, len(self) + 1))
+        start = self._child_bounds[node + 1]
+        end = self._child_bounds[node + 2]
+        return self._child_order[start:end]
+
+    def label(self, node):
+        label = self.labels[node]
+        return self.strings[label] if label >= 0 else None
+
+    def field_type(self, node):
+        return FieldType(int(self.field_types[node]))
+
+    def is_block(self, node):
+        return self.kinds[node] == EventType.BEGIN.value
+
+    # path segments are labels, child positions or * for any child, e.g. "assets/*/provider/filename"
+    def find(self, path, node=0):
+        nodes = [node]
+        for segment in path.strip("/").split("/"):
+            if segment == "":
+                continue
+            matches = []
+            label = self.string_index.get(segment, -2)
+            for parent in nodes:
+                children = self.children(parent)
+                if segment == "*":
+                    matches.extend(children.tolist())
+                elif segment.isdigit() and label == -2:
+                    if int(segment) < len(children):
+                        matches.append(int(children[int(segment)]))
+                else:
+                    matches.extend(children[self.labels[children] == label].tolist())
+            nodes = matches
+        return nodes
+
+    def get(self, path, default=None, node=0):
+        nodes = self.find(path, node)
+        return self.value(nodes[0]) if nodes else default
+
+    def values(self, path, node=0):
+        return [self.value(node) for node in self.find(path, node)]
+
+    def value(self, node):
+        kind = self.kinds[node]
+        if kind == EventType.BEGIN.value:
+            return None
+        elif kind == EventType.ARRAY.value:
+            start = int(self.offsets[node])
+            return ArrayData(self.reader.data[start:start + int(self.sizes[node])])
+
+        field_type = self.field_type(node)
+        if field_type is FieldType.STRING:
+            return self.strings[self.string_ids[node]]
+        symbol, count = field_type_to_symbol[field_type]
+        self.reader.seek(int(self.offsets[node]))
+        return self.reader.read_scalar(symbol) if count == 1 else self.reader.read(symbol, count)
+
+    # materialize a subtree the way JsonResourceBuilder would have built it
+    def to_json(self, node=0):
+        if not self.is_block(node):
+            return self.value(node)
+        block = {}
+        for child in self.children(node).tolist():
+            label = self.label(child)
+            block[len(block) if label is None else label] = self.to_json(child)
+        return block
+
+
 class ResourceParser:
-    def __init__(self, filename, data=None):
+    def __init__(self, filename, data=None, use_mmap=False):
         self.filename = filename
         self.reader = data and BinaryReader(data)
+        self.use_mmap = use_mmap
         self.version = None
         self.header_size = None
         self.json = None
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
     def _parse_strings(self):
         string_count = self.reader.read_uint32()
         strings = []
@@ -82,95 +398,41 @@ class ResourceParser:
             strings.append(self.reader.read_string(str_len))
         return strings
 
+    def _parse_header(self):
+        if self.reader is None:
+            self.reader = BinaryReader.from_file(self.filename, self.use_mmap)
+        self.version = self.reader.read_uint32()
+        if self.version not in [1, 2]:
+            raise NotImplementedError(f"Resource version {self.version} not supported")
+        self.header_size = self.reader.read_uint32()
+        self.reader.seek(0x48)
+
+    # builders which only need offsets can set decode_values to False, see ResourceEventReader
     def _parse_values(self, builder):
-        if self.version == 2:
-            strings = self._parse_strings()
-
-        while not builder.finished():
-            tag = FieldType(self.reader.read_uint16())
-            if tag != FieldType.END:
-                if self.version == 1:
-                    label_len = self.reader.read_uint32()
-                    label = self.reader.read_string(label_len) if label_len > 0 else None
-                elif self.version == 2:
-                    label_index = self.reader.read_uint32()
-                    label = strings[label_index - 1] if label_index > 0 else None
-                size = self.reader.read_uint32()
-
-            if tag == FieldType.BEGIN:
-                builder.start_block(label)
-            elif tag == FieldType.END:
+        for event in self.iter_values(getattr(builder, "decode_values", True)):
+            event_type = event.type
+            if event_type is EventType.VALUE:
+                tag, sub_tag = field_type_to_tag[event.field_type]
+                builder.add_value(event.label, event.value, tag, sub_tag, event.offset)
+            elif event_type is EventType.BEGIN:
+                builder.start_block(event.label)
+            elif event_type is EventType.END:
                 builder.finish_block()
-            elif tag == FieldType.BOOL:
-                value = self.reader.read_bool8()
-                builder.add_value(label, value, "bool8")
-            elif tag == FieldType.BYTES:
-                offset = self.reader.read_uint32()
-                builder.add_array(label, offset, size)
-            elif tag == FieldType.DOUBLE:
-                value = self.reader.read_float64()
-                builder.add_value(label, value, "float64")
-            elif tag == FieldType.FLOAT:
-                value = self.reader.read_float32()
-                builder.add_value(label, value, "float32")
-            elif tag == FieldType.INT32:
-                value = self.reader.read_int32()
-                builder.add_value(label, value, "int32")
-            elif tag == FieldType.INT64:
-                value = self.reader.read_int64()
-                builder.add_value(label, value, "int64")
-            elif tag == FieldType.MAT2:
-                value = self.reader.read_mat2()
-                builder.add_value(label, value, "mat2f", "float32")
-            elif tag == FieldType.MAT3:
-                value = self.reader.read_mat3()
-                builder.add_value(label, value, "mat3f", "float32")
-            elif tag == FieldType.MAT4:
-                value = self.reader.read_mat4()
-                builder.add_value(label, value, "mat4f", "float32")
-            elif tag == FieldType.QUAT:
-                value = self.reader.read_quat()
-                builder.add_value(label, value, "quatf", "float32")
-            elif tag == FieldType.STRING:
-                string_index = self.reader.read_uint32()
-                value = strings[string_index - 1]
-                builder.add_value(label, value, "string")
-            elif tag == FieldType.STRINGV1:
-                string_len = self.reader.read_uint32()
-                value = self.reader.read_string(string_len)
-                builder.add_value(label, value, "string")
-            elif tag == FieldType.UINT32:
-                value = self.reader.read_uint32()
-                builder.add_value(label, value, "uint32")
-            elif tag == FieldType.UINT64:
-                value = self.reader.read_uint64()
-                builder.add_value(label, value, "uint64")
-            elif tag == FieldType.VEC2F:
-                value = self.reader.read_vec2f()
-                builder.add_value(label, value, "vec2f", "float32")
-            elif tag == FieldType.VEC3F:
-                value = self.reader.read_vec3f()
-                builder.add_value(label, value, "vec3f", "float32")
-            elif tag == FieldType.VEC4F:
-                value = self.reader.read_vec4f()
-                builder.add_value(label, value, "vec4f", "float32")
-            elif tag == FieldType.VEC4B:
-                value = self.reader.read_vec4b()
-                builder.add_value(label, value, "vec4b", "int8")
             else:
-                raise ValueError("Tag not recognized")
+                builder.add_array(event.label, event.value, event.size)
         builder.infer_arrays(self.reader.data, self.header_size)
         return builder.root
 
+    # event stream over the values following the header, see ResourceEventReader
+    def iter_values(self, decode_values=True):
+        strings = self._parse_strings() if self.version == 2 else None
+        return ResourceEventReader(self.reader, self.version, strings, decode_values)
+
+    def iter_events(self, decode_values=True):
+        self._parse_header()
+        return self.iter_values(decode_values)
+
     def parse(self, builder_cls=JsonResourceBuilder):
-        if self.reader is None:
-            with open(self.filename, "rb") as f:
-                data = f.read()
-            self.reader = BinaryReader(data)
-        self.version = self.reader.read_uint32()
-        if self.version not in [1, 2]:
-            raise NotImplementedError(f"Resource version {self.version} not supported")
-        self.header_size = self.reader.read_uint32()
-        self.reader.seek(0x48)
+        self._parse_header()
         self.json = self._parse_values(builder_cls())
         return self.json
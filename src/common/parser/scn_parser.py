@@ -1,8 +1,21 @@
 import os.path
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
+import numpy as np
+
+from .asset_index import AssetIndex
+from .lns_archive import LnsArchive
 from .mesh_parser import MeshParser
 from .resource_parser import ResourceParser
 
+AssetInfo = namedtuple("AssetInfo", ["name", "uid", "type", "filename", "size"])
+
+
+def _parse_mesh(data):
+    return MeshParser(None, data=data).parse()
+
 
 class Asset:
     def __init__(self, name, uid):
@@ -12,17 +25,38 @@ class Asset:
         self.bpy = None  # used by importer
 
 
-class MeshAsset(Asset):
-    def __init__(self, name, uid, data):
+# asset whose payload is loaded on first access of data, the result is cached
+class DataAsset(Asset):
+    def __init__(self, name, uid, data=None, loader=None):
         super().__init__(name, uid)
-        self.data = data
+        self._data = data
+        self._loader = loader
 
+    @property
+    def data(self):
+        if self._loader is not None:
+            self._data = self._loader()
+            self._loader = None
+        return self._data
 
-class TextureAsset(Asset):
-    def __init__(self, name, uid, data):
-        super().__init__(name, uid)
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._loader = None
+
+    def loaded(self):
+        return self._loader is None
+
+
+class MeshAsset(DataAsset):
+    def __init__(self, name, uid, data=None, loader=None):
+        super().__init__(name, uid, data, loader)
+
+
+class TextureAsset(DataAsset):
+    def __init__(self, name, uid, data=None, loader=None):
+        super().__init__(name, uid, data, loader)
         self.extension = os.path.splitext(name)[1]
-        self.data = data
 
 
 class MaterialAsset(Asset):
@@ -89,12 +123,68 @@ class RenderComponent(Component):
         self.materials = []
 
 
+# flat, array backed view of the scene hierarchy. nodes are stored in pre-order, so parents come before children
+class SceneGraph:
+    def __init__(self, parents, names, uids, positions, rotations, scales):
+        self.parents = np.asarray(parents, dtype=np.int32)  # -1 for root objects
+        self.names = names
+        self.uids = uids
+        self.positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        self.rotations = np.asarray(rotations, dtype=np.float32).reshape(-1, 4)  # quaternions as x, y, z, w
+        self.scales = np.asarray(scales, dtype=np.float32).reshape(-1, 3)
+
+        depths = []
+        for parent in self.parents.tolist():
+            depths.append(depths[parent] + 1 if parent >= 0 else 0)
+        self.depths = np.array(depths, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.parents)
+
+    def children(self, index):
+        return np.flatnonzero(self.parents == index)
+
+    # translation @ rotation @ scale for every node, shape (N, 4, 4)
+    def local_matrices(self):
+        x, y, z, w = np.asarray(self.rotations, dtype=np.float64).T
+        norm = np.sqrt(x * x + y * y + z * z + w * w)
+        norm[norm == 0] = 1
+        x, y, z, w = x / norm, y / norm, z / norm, w / norm
+
+        matrices = np.zeros((len(self), 4, 4))
+        matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+        matrices[:, 0, 1] = 2 * (x * y - z * w)
+        matrices[:, 0, 2] = 2 * (x * z + y * w)
+        matrices[:, 1, 0] = 2 * (x * y + z * w)
+        matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+        matrices[:, 1, 2] = 2 * (y * z - x * w)
+        matrices[:, 2, 0] = 2 * (x * z - y * w)
+        matrices[:, 2, 1] = 2 * (y * z + x * w)
+        matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+        matrices[:, :3, :3] *= self.scales[:, None, :]
+        matrices[:, :3, 3] = self.positions
+        matrices[:, 3, 3] = 1
+        return matrices
+
+    # world matrices are computed one hierarchy level at a time, each level as a single batched matmul
+    def world_matrices(self):
+        matrices = self.local_matrices()
+        order = np.argsort(self.depths, kind="stable")
+        bounds = np.searchsorted(self.depths[order], np.arange(1, self.depths.max(initial=0) + 2))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            nodes = order[start:end]
+            matrices[nodes] = matrices[self.parents[nodes]] @ matrices[nodes]
+        return matrices
+
+
 class Scene:
     def __init__(self):
         self.meshes = {}  #
         self.textures = {}  # uid => filename
         self.materials = {}  #
         self.sceneobjects = []
+        self.graph = None
+        self.index = None  # AssetIndex of the scene assets
 
 
 class ScnParser(ResourceParser):
@@ -105,6 +195,8 @@ class ScnParser(ResourceParser):
         self.scene = None
         self.reports = []
         self.parse_materials = True
+        self.lazy_assets = True
+        self.executor = None  # optional concurrent.futures executor used to decode meshes in parallel
 
     def parse(self):
         super().parse()
@@ -114,11 +206,40 @@ class ScnParser(ResourceParser):
 
         return self.scene
 
+    # iterative pre-order walk, deep hierarchies do not run into the recursion limit
     def _parse_sceneobjects(self):
-        for sceneobject_json in self.json["sceneobjects"].values():
+        parents = []
+        names = []
+        uids = []
+        positions = []
+        rotations = []
+        scales = []
+
+        stack = [(sceneobject_json, None, -1) for sceneobject_json in self.json["sceneobjects"].values()]
+        stack.reverse()
+        while stack:
+            sceneobject_json, parent, parent_index = stack.pop()
             sceneobject = self._parse_sceneobject(sceneobject_json)
-            self.scene.sceneobjects.append(sceneobject)
+            if parent is None:
+                self.scene.sceneobjects.append(sceneobject)
+            else:
+                parent.children.append(sceneobject)
+
+            index = len(parents)
+            parents.append(parent_index)
+            names.append(sceneobject.name)
+            uids.append(sceneobject.uid)
+            positions.append(sceneobject.location)
+            rotations.append(sceneobject.rotation)
+            scales.append(sceneobject.scale)
+
+            if "children" in sceneobject_json:
+                children = [(child_json, sceneobject, index) for child_json in sceneobject_json["children"].values()]
+                stack.extend(reversed(children))
+
+        self.scene.graph = SceneGraph(parents, names, uids, positions, rotations, scales)
 
+    # builds a single object and its components, children are attached by _parse_sceneobjects
     def _parse_sceneobject(self, sceneobject_json):
         name = sceneobject_json["name"]
         uid = sceneobject_json["uid"]
@@ -142,25 +263,13 @@ class ScnParser(ResourceParser):
                             component.materials.append(material)
                         sceneobject.components.append(component)
 
-        if "children" in sceneobject_json:
-            for child_json in sceneobject_json["children"].values():
-                child = self._parse_sceneobject(child_json)
-                sceneobject.children.append(child)
-
         return sceneobject
 
     def _parse_assets(self):
-        meshes_json = []
-        textures_json = []
-        materials_json = []
-
-        for asset in self.json["assets"].values():
-            if asset["type"] == "Asset.RenderMesh":
-                meshes_json.append(asset)
-            elif asset["type"] == "Asset.Texture":
-                textures_json.append(asset)
-            elif asset["type"] == "Asset.Material":
-                materials_json.append(asset)
+        self.scene.index = AssetIndex.from_json(self.json["assets"])
+        meshes_json = [ref.block for ref in self.scene.index.by_type("Asset.RenderMesh")]
+        textures_json = [ref.block for ref in self.scene.index.by_type("Asset.Texture")]
+        materials_json = [ref.block for ref in self.scene.index.by_type("Asset.Material")]
 
         for mesh_json in meshes_json:
             name = mesh_json["name"]
@@ -169,11 +278,12 @@ class ScnParser(ResourceParser):
                 filename = mesh_json["provider"]["filename"]
                 if name == "":
                     name = filename
-                file = self._get_file(filename)
-                if file is not None:
-                    parser = MeshParser(None, data=file)
-                    mesh_data = parser.parse()
-                    mesh = MeshAsset(name, uid, mesh_data)
+                if self._has_file(filename):
+                    if self.executor is not None:
+                        loader = self._submit_mesh(filename)
+                    else:
+                        loader = partial(self._load_mesh, filename)
+                    mesh = MeshAsset(name, uid, loader=loader)
                     self.scene.meshes[uid] = mesh
             else:
                 self.reports.append(({"INFO"}, f"Skipped mesh asset {name}"))
@@ -185,13 +295,16 @@ class ScnParser(ResourceParser):
                 filename = texture_json["provider"]["filename"]
                 if name == "":
                     name = filename
-                file = self._get_file(filename)
-                if file is not None:
-                    texture = TextureAsset(name, uid, file)
+                if self._has_file(filename):
+                    texture = TextureAsset(name, uid, loader=partial(self._get_file, filename))
                     self.scene.textures[uid] = texture
             else:
                 self.reports.append(({"INFO"}, f"Skipped texture asset {name}"))
 
+        if not self.lazy_assets:
+            for asset in list(self.scene.meshes.values()) + list(self.scene.textures.values()):
+                asset.data
+
         for material_json in materials_json:
             name = material_json["name"]
             uid = material_json["uid"]
@@ -259,8 +372,64 @@ class ScnParser(ResourceParser):
             material.uv3_scale = prop_values["uv3Scale"]
             material.uv3_offset = prop_values["uv3Offset"]
 
+    # asset metadata straight from the scene, no payload is read or parsed
+    def list_assets(self):
+        assets = []
+        for asset_json in self.json["assets"].values():
+            filename = None
+            size = None
+            if "provider" in asset_json and "filename" in asset_json["provider"]:
+                filename = asset_json["provider"]["filename"]
+                size = self._get_file_size(filename)
+            assets.append(AssetInfo(asset_json["name"], asset_json["uid"], asset_json["type"], filename, size))
+        return assets
+
     ##### helpers #####
 
+    def _load_mesh(self, filename):
+        file = self._get_file(filename)
+        if file is None:
+            return None
+        parser = MeshParser(None, data=file)
+        return parser.parse()
+
+    # files are read here in scene order, so reports stay deterministic. decoding happens on the executor
+    # and the returned loader waits for its result.
+    def _submit_mesh(self, filename):
+        file = self._get_file(filename)
+        if file is None:
+            return lambda: None
+        if isinstance(self.executor, ProcessPoolExecutor):
+            file = bytes(file)
+        return self.executor.submit(_parse_mesh, file).result
+
+    def _has_file(self, filename):
+        if not filename.startswith("/"):
+            filename = "/" + filename
+        if filename in self.files:
+            return True
+        elif not self.files_preloaded:
+            if os.path.isfile(os.path.dirname(self.filename) + filename):
+                return True
+            self.reports.append(({"WARNING"}, f"Failed to read file {filename}"))
+            return False
+        else:
+            self.reports.append(({"WARNING"}, f"File {filename} not found"))
+            return False
+
+    def _get_file_size(self, filename):
+        if not filename.startswith("/"):
+            filename = "/" + filename
+        if isinstance(self.files, LnsArchive) and filename in self.files:
+            return self.files.get_entry(filename).size
+        elif filename in self.files:
+            return len(self.files[filename])
+        elif not self.files_preloaded:
+            filepath = os.path.dirname(self.filename) + filename
+            if os.path.isfile(filepath):
+                return os.path.getsize(filepath)
+        return None
+
     def _get_file(self, filename):
         if not filename.startswith("/"):
             filename = "/" + filename
@@ -0,0 +1,77 @@
+from ..parser.resource_parser import ColumnarResourceBuilder, ResourceParser
+from ..types.enums import field_type_to_symbol
+from ..util.binary_writer import _get_array_struct
+from .resource_serializer import symbol_to_converter
+
+
+# overwrites fixed size values in place. the resource is indexed once, every value keeps the offset of its
+# payload so a change is a single struct.pack_into and the rest of the file stays untouched.
+class ResourcePatcher:
+    def __init__(self, filename, data=None):
+        if data is None:
+            with open(filename, "rb") as f:
+                data = f.read()
+        self.data = bytearray(data)
+        self.parser = ResourceParser(filename, data=self.data)
+        self.tree = self.parser.parse(ColumnarResourceBuilder)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.parser is not None:
+            self.tree.reader.close()
+            self.parser.close()
+            self.parser = None
+            self.tree = None
+
+    # path segments are labels, child positions or * as in ResourceTree.find
+    def find(self, path):
+        return self.tree.find(path)
+
+    def get(self, path, default=None):
+        return self.tree.get(path, default)
+
+    # sets every value matching path, returns how many were changed
+    def set(self, path, value):
+        nodes = self.find(path)
+        if not nodes:
+            raise KeyError(f"No value found at {path}")
+
+        # every value is converted before anything is written, so a bad value leaves the resource untouched
+        packs = []
+        for node in nodes:
+            field_type = self.tree.field_type(node)
+            if self.tree.is_block(node) or field_type not in field_type_to_symbol:
+                raise ValueError(f"{path} matches a {field_type.name} field which can't be patched in place")
+            packs.append(self._pack_args(node, value))
+
+        for packer, offset, values in packs:
+            packer.pack_into(self.data, offset, *values)
+        return len(nodes)
+
+    def set_node(self, node, value):
+        packer, offset, values = self._pack_args(node, value)
+        packer.pack_into(self.data, offset, *values)
+
+    def _pack_args(self, node, value):
+        field_type = self.tree.field_type(node)
+        symbol, count = field_type_to_symbol[field_type]
+        convert = symbol_to_converter[symbol]
+        if count == 1:
+            values = [convert(value)]
+        elif len(value) != count:
+            raise ValueError(f"Expected {count} values for {field_type.name}, got {len(value)}")
+        else:
+            values = [convert(v) for v in value]
+        return _get_array_struct("<", symbol, count), int(self.tree.offsets[node]), values
+
+    def get_bytes(self):
+        return bytes(self.data)
+
+    def to_file(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self.data)
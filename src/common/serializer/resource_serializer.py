@@ -1,9 +1,33 @@
 import numpy as np
 
-from ..types.enums import FieldType
+from ..parser.resource_parser import ArrayData, TypedValue
+from ..types.enums import FieldType, field_type_to_symbol
 from ..util.binary_writer import BinaryWriter
 
 
+# bools are accepted as bool or "true"/"false" text, anything else would silently become True
+def to_bool(value):
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError(f"Expected a bool or true/false, got {value!r}")
+
+
+# integers are accepted as int, integer text or floats without a fractional part
+def to_int(value):
+    if isinstance(value, (float, np.floating)):
+        if not float(value).is_integer():
+            raise ValueError(f"Expected an integer, got {value!r}")
+        return int(value)
+    return int(value)
+
+
+# converts fixed size values, given as numbers or their text, to the python type packed for a struct symbol
+symbol_to_converter = {"f": float, "d": float, "?": to_bool, "b": to_int, "i": to_int, "I": to_int, "q": to_int,
+                       "Q": to_int}
+
+
 class ResourceSerializer:
     def __init__(self):
         self.header_writer = BinaryWriter()
@@ -13,13 +37,17 @@ class ResourceSerializer:
         self.strings = {}
 
     def _write_string(self, label):
+        if label is None:
+            self.value_writer.write_uint32(0)
+            return
         if label in self.strings:
             index = self.strings[label]
         else:
             index = len(self.strings) + 1
             self.strings[label] = index
-            self.string_writer.write_uint32(len(label))
-            self.string_writer.write_string(label)
+            encoded = label.encode()
+            self.string_writer.write_uint32(len(encoded))
+            self.string_writer.write_bytes(encoded)
         self.value_writer.write_uint32(index)
 
     def write(self, type_enum, key, np_value):
@@ -28,23 +56,40 @@ class ResourceSerializer:
         self.value_writer.write_uint32(np_value.nbytes)
         self.value_writer.write(np_value)
 
+    # fixed size values are packed straight into the value buffer, components may be numbers or their text
+    def write_fixed(self, type_enum, key, value, convert=None):
+        symbol, count = field_type_to_symbol[type_enum]
+        convert = convert or symbol_to_converter[symbol]
+        if count == 1:
+            values = [convert(value)]
+        elif len(value) != count:
+            raise ValueError(f"Expected {count} values for {type_enum.name}, got {len(value)}")
+        else:
+            values = [convert(v) for v in value]
+
+        self.value_writer.write_uint16(type_enum.value)
+        self._write_string(key)
+        self.value_writer.write_uint32(self.value_writer.structs[symbol].size * count)
+        self.value_writer.write_array(symbol, values)
+
     def begin(self, key=None):
         self.value_writer.write_uint16(FieldType.BEGIN.value)
-        if key is not None:
-            self._write_string(key)
-        else:
-            self.value_writer.write_uint32(0)
+        self._write_string(key)
         self.value_writer.write_uint32(0)
 
     def end(self):
         self.value_writer.write_uint16(FieldType.END.value)
 
-    def write_bytes(self, key, value):
+    # count is stored with the field as is, raw is the already encoded array data
+    def write_array(self, key, count, raw):
         self.value_writer.write_uint16(FieldType.BYTES.value)
         self._write_string(key)
-        self.value_writer.write_uint32(len(value))
+        self.value_writer.write_uint32(count)
         self.value_writer.write_uint32(self.array_writer.size)
-        self.array_writer.write_bytes(value)
+        self.array_writer.write_bytes(raw)
+
+    def write_bytes(self, key, value):
+        self.write_array(key, len(value), value)
 
     def write_bytes_array(self, key, value):
         self.value_writer.write_uint16(FieldType.BYTES.value)
@@ -60,53 +105,54 @@ class ResourceSerializer:
         self.value_writer.write_uint32(len(value))
         self.value_writer.write_uint32(self.array_writer.size)
         for string in value:
-            self.array_writer.write_uint32(len(string))
-            self.array_writer.write_string(string)
+            encoded = string.encode()
+            self.array_writer.write_uint32(len(encoded))
+            self.array_writer.write_bytes(encoded)
 
     def write_bool8(self, key, value):
-        self.write(FieldType.BOOL, key, np.bool8(value))
+        self.write_fixed(FieldType.BOOL, key, value)
 
     def write_float64(self, key, value):
-        self.write(FieldType.DOUBLE, key, np.float64(value))
+        self.write_fixed(FieldType.DOUBLE, key, value)
 
     def write_float32(self, key, value):
-        self.write(FieldType.FLOAT, key, np.float32(value))
+        self.write_fixed(FieldType.FLOAT, key, value)
 
     def write_int32(self, key, value):
-        self.write(FieldType.INT32, key, np.int32(value))
+        self.write_fixed(FieldType.INT32, key, value)
 
     def write_uint32(self, key, value):
-        self.write(FieldType.UINT32, key, np.uint32(value))
+        self.write_fixed(FieldType.UINT32, key, value)
 
     def write_int64(self, key, value):
-        self.write(FieldType.INT64, key, np.int64(value))
+        self.write_fixed(FieldType.INT64, key, value)
 
     def write_uint64(self, key, value):
-        self.write(FieldType.UINT64, key, np.uint64(value))
+        self.write_fixed(FieldType.UINT64, key, value)
 
     def write_vec2f(self, key, value):
-        self.write(FieldType.VEC2F, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.VEC2F, key, value)
 
     def write_vec3f(self, key, value):
-        self.write(FieldType.VEC3F, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.VEC3F, key, value)
 
     def write_vec4f(self, key, value):
-        self.write(FieldType.VEC4F, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.VEC4F, key, value)
 
     def write_vec4b(self, key, value):
-        self.write(FieldType.VEC4B, key, np.array(value, dtype=np.int8))
+        self.write_fixed(FieldType.VEC4B, key, value)
 
     def write_mat2f(self, key, value):
-        self.write(FieldType.MAT2, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.MAT2, key, value)
 
     def write_mat3f(self, key, value):
-        self.write(FieldType.MAT3, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.MAT3, key, value)
 
     def write_mat4f(self, key, value):
-        self.write(FieldType.MAT4, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.MAT4, key, value)
 
     def write_quatf(self, key, value):
-        self.write(FieldType.QUAT, key, np.array(value, dtype=np.float32))
+        self.write_fixed(FieldType.QUAT, key, value)
 
     def write_string(self, key, value):
         self.value_writer.write_uint16(FieldType.STRING.value)
@@ -114,6 +160,34 @@ class ResourceSerializer:
         self.value_writer.write_uint32(4)
         self._write_string(value)
 
+    def write_value(self, type_enum, key, value):
+        if type_enum in (FieldType.STRING, FieldType.STRINGV1):
+            self.write_string(key, value)
+            return
+        self.write_fixed(type_enum, key, value)
+
+    # writes the fields of a tree built by TypedResourceBuilder. blocks are dicts, unlabeled blocks have integer keys
+    def write_tree(self, tree):
+        stack = [iter(tree.items())]
+        while stack:
+            for key, value in stack[-1]:
+                label = key if isinstance(key, str) else None
+                if isinstance(value, dict):
+                    self.begin(label)
+                    stack.append(iter(value.items()))
+                    break
+                elif isinstance(value, TypedValue):
+                    self.write_value(value.field_type, label, value.value)
+                elif isinstance(value, ArrayData):
+                    count = len(value.data) if value.count is None else value.count
+                    self.write_array(label, count, value.data)
+                else:
+                    raise ValueError(f"Value of {key} has no field type")
+            else:
+                stack.pop()
+                if stack:
+                    self.end()
+
     def finalize(self):
         self.end()
         self.header_writer.write_uint32(2)
@@ -121,10 +195,20 @@ class ResourceSerializer:
         self.header_writer.write_bytes(bytes(64))
         self.header_writer.write_uint32(len(self.strings))
 
+    def _writers(self):
+        return self.header_writer, self.string_writer, self.value_writer, self.array_writer
+
+    # the sections are copied once into the result
     def get_bytes(self):
-        return self.header_writer.get_bytes() + self.string_writer.get_bytes() + self.value_writer.get_bytes() + self.array_writer.get_bytes()
+        views = [writer.getbuffer() for writer in self._writers()]
+        try:
+            return b"".join(views)
+        finally:
+            for view in views:
+                view.release()
 
     def to_file(self, filename):
-        joined_data = self.get_bytes()
         with open(filename, "wb") as f:
-            f.write(joined_data)
+            for writer in self._writers():
+                with writer.getbuffer() as view:
+                    f.write(view)
@@ -41,3 +41,30 @@ class FieldType(Enum):
     VEC3F = 0x08
     VEC4F = 0x09
     VEC4B = 0x17
+
+
+# struct symbol and component count of fixed size field values
+field_type_to_symbol = {
+    FieldType.BOOL: ("?", 1),
+    FieldType.DOUBLE: ("d", 1),
+    FieldType.FLOAT: ("f", 1),
+    FieldType.INT32: ("i", 1),
+    FieldType.INT64: ("q", 1),
+    FieldType.MAT2: ("f", 4),
+    FieldType.MAT3: ("f", 9),
+    FieldType.MAT4: ("f", 16),
+    FieldType.QUAT: ("f", 4),
+    FieldType.UINT32: ("I", 1),
+    FieldType.UINT64: ("Q", 1),
+    FieldType.VEC2F: ("f", 2),
+    FieldType.VEC3F: ("f", 3),
+    FieldType.VEC4F: ("f", 4),
+    FieldType.VEC4B: ("b", 4)
+}
+
+
+class EventType(Enum):
+    BEGIN = 0
+    END = 1
+    VALUE = 2
+    ARRAY = 3
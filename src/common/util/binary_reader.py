@@ -1,3 +1,7 @@
+import mmap
+import os
+import struct
+
 import numpy as np
 
 
@@ -5,51 +9,110 @@ class BinaryReaderError(IndexError):
     pass
 
 
+_structs = {}
+_dtypes = {}
+
+
+def _get_structs(endianness):
+    if endianness not in _structs:
+        _structs[endianness] = {fmt: struct.Struct(endianness + fmt) for fmt in "bBhHiIqQefd?"}
+    return _structs[endianness]
+
+
 class BinaryReader:
+    # data is accessed through a memoryview, slices returned by read_bytes share memory with it
     def __init__(self, data, endianness="<"):
-        self.data = data
+        self.data = memoryview(data).cast("B")
         self.endianness = endianness
         self.offset = 0
+        self.mmap = None
+        self.structs = _get_structs(endianness)
+
+    @classmethod
+    def from_file(cls, filename, use_mmap=False, endianness="<"):
+        with open(filename, "rb") as f:
+            if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+                return cls(f.read(), endianness)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        reader = cls(data, endianness)
+        reader.mmap = data
+        return reader
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.data is not None:
+            try:
+                self.data.release()
+            except BufferError:
+                pass
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                # views or arrays handed out still reference the mapping, it is unmapped once they are released
+                pass
+            self.mmap = None
+        self.data = None
 
     def read(self, fmt, count=1):
-        dt = np.dtype(fmt).newbyteorder(self.endianness)
+        key = (fmt, self.endianness) if isinstance(fmt, str) else None
+        dt = _dtypes.get(key)
+        if dt is None:
+            dt = np.dtype(fmt).newbyteorder(self.endianness)
+            if key is not None:
+                _dtypes[key] = dt
         self.check_offset(self.offset + dt.itemsize * count)
         value = np.frombuffer(self.data, dt, count, self.offset)
         self.offset += dt.itemsize * count
         return value
 
+    # scalars are decoded with precompiled structs and returned as plain python values
+    def read_scalar(self, fmt):
+        unpacker = self.structs[fmt]
+        offset = self.offset
+        end = offset + unpacker.size
+        if end > len(self.data):
+            raise BinaryReaderError("Binary reader out of bounds")
+        self.offset = end
+        return unpacker.unpack_from(self.data, offset)[0]
+
     def read_int8(self):
-        return self.read("b")[0]
+        return self.read_scalar("b")
 
     def read_uint8(self):
-        return self.read("B")[0]
+        return self.read_scalar("B")
 
     def read_int16(self):
-        return self.read("h")[0]
+        return self.read_scalar("h")
 
     def read_uint16(self):
-        return self.read("H")[0]
+        return self.read_scalar("H")
 
     def read_int32(self):
-        return self.read("i")[0]
+        return self.read_scalar("i")
 
     def read_uint32(self):
-        return self.read("I")[0]
+        return self.read_scalar("I")
 
     def read_int64(self):
-        return self.read("q")[0]
+        return self.read_scalar("q")
 
     def read_uint64(self):
-        return self.read("Q")[0]
+        return self.read_scalar("Q")
 
     def read_float32(self):
-        return self.read("f")[0]
+        return self.read_scalar("f")
 
     def read_float64(self):
-        return self.read("d")[0]
+        return self.read_scalar("d")
 
     def read_bool8(self):
-        return self.read("?")[0]
+        return self.read_scalar("?")
 
     def read_vec2f(self):
         return self.read("f", 2)
@@ -76,7 +139,7 @@ class BinaryReader:
         return self.read("f", 16)
 
     def read_string(self, n):
-        return self.read_bytes(n).decode()
+        return str(self.read_bytes(n), "utf-8")
 
     def read_bytes(self, n):
         self.check_offset(self.offset + n)
@@ -85,7 +148,7 @@ class BinaryReader:
         return value
 
     def read_float16(self):
-        return self.read("f2")[0]
+        return self.read_scalar("e")
 
     def seek(self, offset):
         self.check_offset(offset)
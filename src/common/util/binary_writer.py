@@ -1,38 +1,119 @@
+import struct
+
 import numpy as np
 
+from .binary_reader import _get_structs
+
+_array_structs = {}
+
+
+def _get_array_struct(endianness, fmt, count):
+    key = (endianness, fmt, count)
+    if key not in _array_structs:
+        _array_structs[key] = struct.Struct(f"{endianness}{count}{fmt}")
+    return _array_structs[key]
+
 
 class BinaryWriter:
-    def __init__(self, endianness="<"):
+    # values are packed into a single bytearray which grows geometrically, only the first size bytes are used
+    def __init__(self, endianness="<", capacity=0):
         self.endianness = endianness
-        self.data = []
+        self.data = bytearray(capacity)
         self.size = 0
+        self.structs = _get_structs(endianness)
 
     def to_file(self, filename):
-        joined_data = self.get_bytes()
         with open(filename, "wb") as f:
-            f.write(joined_data)
+            with self.getbuffer() as view:
+                f.write(view)
+
+    # zero copy view of the written data, the writer can't grow while it is held
+    def getbuffer(self):
+        return memoryview(self.data)[:self.size]
 
     def get_bytes(self):
-        return b"".join(self.data)
+        with self.getbuffer() as view:
+            return bytes(view)
+
+    def _ensure_capacity(self, end):
+        if end > len(self.data):
+            self.data.extend(bytes(max(end, 2 * len(self.data), 256) - len(self.data)))
 
     def write(self, np_value):
-        self.data.append(np_value.tobytes())
-        self.size += np_value.nbytes
-        return np_value.nbytes
+        return self.write_bytes(np.ascontiguousarray(np_value).tobytes())
 
-    def write_uint32(self, value):
-        return self.write(np.uint32(value))
+    def write_scalar(self, fmt, value):
+        packer = self.structs[fmt]
+        end = self.size + packer.size
+        self._ensure_capacity(end)
+        packer.pack_into(self.data, self.size, value)
+        self.size = end
+        return packer.size
+
+    def write_array(self, fmt, values):
+        packer = _get_array_struct(self.endianness, fmt, len(values))
+        end = self.size + packer.size
+        self._ensure_capacity(end)
+        packer.pack_into(self.data, self.size, *values)
+        self.size = end
+        return packer.size
+
+    def write_int8(self, value):
+        return self.write_scalar("b", value)
+
+    def write_uint8(self, value):
+        return self.write_scalar("B", value)
+
+    def write_int16(self, value):
+        return self.write_scalar("h", value)
 
     def write_uint16(self, value):
-        return self.write(np.uint16(value))
+        return self.write_scalar("H", value)
+
+    def write_int32(self, value):
+        return self.write_scalar("i", value)
+
+    def write_uint32(self, value):
+        return self.write_scalar("I", value)
+
+    def write_int64(self, value):
+        return self.write_scalar("q", value)
+
+    def write_uint64(self, value):
+        return self.write_scalar("Q", value)
+
+    def write_float32(self, value):
+        return self.write_scalar("f", value)
+
+    def write_float64(self, value):
+        return self.write_scalar("d", value)
+
+    def write_bool8(self, value):
+        return self.write_scalar("?", value)
 
     def write_bytes(self, value):
-        self.data.append(value)
-        self.size += len(value)
-        return len(value)
+        with memoryview(value) as view:
+            n = view.nbytes
+            end = self.size + n
+            self._ensure_capacity(end)
+            self.data[self.size:end] = view
+        self.size = end
+        return n
 
     def write_string(self, value):
-        b = value.encode()
-        self.data.append(b)
-        self.size += len(b)
-        return len(b)
+        return self.write_bytes(value.encode())
+
+    # placeholder for a value which is only known later, returns its offset for patch()
+    def reserve(self, fmt="I"):
+        offset = self.size
+        self.write_scalar(fmt, 0)
+        return offset
+
+    def patch(self, offset, fmt, value):
+        packer = self.structs[fmt]
+        if offset < 0 or offset + packer.size > self.size:
+            raise IndexError("Binary writer patch out of bounds")
+        packer.pack_into(self.data, offset, value)
+
+    def patch_uint32(self, offset, value):
+        self.patch(offset, "I", value)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import re
+
+from ..common.parser.lns_archive import LnsArchive
+
+MANIFEST_NAME = "_manifest.json"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        chunk = f.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = f.read(chunk_size)
+    return digest.hexdigest()
+
+
+# state of an unpacked lens as of the last unpack or pack, used to skip work when repacking.
+# files are compared by size and mtime first and only hashed when those differ.
+class LensManifest:
+    VERSION = 1
+
+    def __init__(self, dirname):
+        self.dirname = os.path.realpath(dirname)
+        self.source = None  # archive the files were last packed into or unpacked from
+        self.order = []  # entry order of that archive
+        self.files = {}  # lens path -> state of the file as stored in the archive
+        self.resources = {}  # xml lens path -> state of the xml and of the resource last converted from it
+
+    @property
+    def path(self):
+        return os.path.join(self.dirname, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, dirname):
+        manifest = cls(dirname)
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != cls.VERSION:
+            return None
+        manifest.source = data["source"]
+        manifest.order = data["order"]
+        manifest.files = data["files"]
+        manifest.resources = data["resources"]
+        return manifest
+
+    def save(self):
+        data = {
+            "version": self.VERSION,
+            "source": self.source,
+            "order": self.order,
+            "files": self.files,
+            "resources": self.resources
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+    def full_path(self, lns_path):
+        return self.dirname + lns_path.replace('/', os.sep)
+
+    def lns_path(self, full_path):
+        return os.path.realpath(full_path)[len(self.dirname):].replace(os.sep, '/')
+
+    # the hash of the previous state is kept as long as size and mtime still match
+    def _state(self, lns_path, previous=None):
+        full_path = self.full_path(lns_path)
+        stat = os.stat(full_path)
+        if previous is not None and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            return previous
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash(full_path)
+        }
+
+    def _unchanged(self, state, lns_path):
+        if state is None:
+            return False
+        try:
+            stat = os.stat(self.full_path(lns_path))
+        except OSError:
+            return False
+        if stat.st_size != state["size"]:
+            return False
+        if stat.st_mtime_ns == state["mtime_ns"]:
+            return True
+        return file_hash(self.full_path(lns_path)) == state["hash"]
+
+    # compression is None for archives which were not written by the packer
+    def record_source(self, filename, order=None, compression=None):
+        filename = os.path.realpath(filename)
+        stat = os.stat(filename)
+        self.source = {"path": filename, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "compression": compression}
+        if order is None:
+            with LnsArchive(filename, use_mmap=True) as archive:
+                order = archive.namelist()
+        self.order = list(order)
+
+    def record_files(self, lns_paths):
+        self.files = {lns_path: self._state(lns_path, self.files.get(lns_path)) for lns_path in lns_paths}
+
+    # .bin files written next to the xml for large byte arrays
+    def _sidecars(self, xml_path):
+        xml_dir, xml_name = xml_path.rsplit('/', 1)
+        pattern = re.escape(os.path.splitext(xml_name)[0]) + r"\.\d+\.bin$"
+        return sorted(f"{xml_dir}/{name}" for name in os.listdir(self.full_path(xml_dir or "/")) if re.match(pattern, name))
+
+    def record_resource(self, xml_path, resource_path):
+        self.resources[xml_path] = {
+            "xml": self._state(xml_path),
+            "sidecars": {path: self._state(path) for path in self._sidecars(xml_path)},
+            "resource_path": resource_path,
+            "resource": self._state(resource_path)
+        }
+
+    # the resource still matches its xml if neither of them nor any sidecar has been touched since the last conversion
+    def resource_unchanged(self, xml_path, resource_path):
+        entry = self.resources.get(xml_path)
+        if entry is None or entry["resource_path"] != resource_path:
+            return False
+        sidecars = entry["sidecars"]
+        if set(self._sidecars(xml_path)) != set(sidecars):
+            return False
+        return self._unchanged(entry["xml"], xml_path) and self._unchanged(entry["resource"], resource_path) \
+            and all(self._unchanged(state, path) for path, state in sidecars.items())
+
+    def source_unchanged(self):
+        if self.source is None:
+            return False
+        try:
+            stat = os.stat(self.source["path"])
+        except OSError:
+            return False
+        return stat.st_size == self.source["size"] and stat.st_mtime_ns == self.source["mtime_ns"]
+
+    # true if the source archive holds exactly the given files
+    def matches_source(self, lns_paths):
+        if not self.source_unchanged() or set(lns_paths) != set(self.files):
+            return False
+        return all(self._unchanged(self.files[lns_path], lns_path) for lns_path in lns_paths)
+
+    # archive order first so a repacked lens lines up with the original, new files after it sorted
+    def ordered(self, files):
+        ordered = {lns_path: files[lns_path] for lns_path in self.order if lns_path in files}
+        for lns_path in sorted(files):
+            if lns_path not in ordered:
+                ordered[lns_path] = files[lns_path]
+        return ordered
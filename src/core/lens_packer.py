@@ -1,11 +1,16 @@
 import os
 import re
+import shutil
 
-from ..tools.lns_tool import create, extract
+from .lens_manifest import LensManifest
+from ..tools.lns_tool import create, extract, list_files, write_lns_files
 from ..tools.resource_tool import resource_to_xml, xml_to_resource
 
 
 class LensPacker:
+    # the unpacked original archive is only reused by pack calls which leave compression at these defaults
+    DEFAULT_COMPRESSION = {"level": 3, "threads": 0, "long_distance": False}
+
     def __init__(self, log_function=print):
         self.log_function = log_function
 
@@ -13,17 +18,51 @@ class LensPacker:
         if self.log_function:
             self.log_function(str)
 
-    def pack(self, input_dir, output_file):
+    # with incremental set, resources whose xml is untouched are not converted again and the source archive
+    # is reused when no file changed, see LensManifest
+    def pack(self, input_dir, output_file, level=3, threads=0, long_distance=False, incremental=True):
         self.log(f"Packing Lens: {input_dir}")
-        self._dir_to_resources(input_dir)
-        create(input_dir, output_file)
+        manifest = None
+        if incremental:
+            manifest = LensManifest.load(input_dir) or LensManifest(input_dir)
+
+        self._dir_to_resources(input_dir, manifest)
+        if manifest is None:
+            create(input_dir, output_file, level, threads, long_distance)
+            return
+
+        files = manifest.ordered(list_files(input_dir))
+        compression = {"level": level, "threads": threads, "long_distance": long_distance}
+        # an archive written with other settings is packed again, so is the unpacked original unless the
+        # settings are the defaults
+        source_compression = manifest.source.get("compression") if manifest.source else None
+        reuse = manifest.matches_source(files) and \
+            compression == (self.DEFAULT_COMPRESSION if source_compression is None else source_compression)
+        # file states are taken before writing, a file saved while packing shows up as changed on the next pack
+        manifest.record_files(files.keys())
+        if reuse:
+            source = manifest.source["path"]
+            self.log(f"No changes, reusing: {source}")
+            if not os.path.exists(output_file) or not os.path.samefile(source, output_file):
+                shutil.copyfile(source, output_file)
+            compression = source_compression
+        else:
+            write_lns_files(output_file, files, level, threads, long_distance)
 
-    def unpack(self, input_file, output_dir):
+        manifest.record_source(output_file, files.keys(), compression)
+        manifest.save()
+
+    def unpack(self, input_file, output_dir, compact=False, sidecar_threshold=None, stream_xml=False):
         self.log(f"Unpacking Lens: {input_file}")
-        extract(input_file, output_dir)
-        self._dir_to_xml(output_dir)
+        extract(input_file, output_dir, stream=True)
+
+        manifest = LensManifest(output_dir)
+        manifest.record_source(input_file)
+        manifest.record_files(list_files(output_dir).keys())
+        self._dir_to_xml(output_dir, compact, sidecar_threshold, stream_xml, manifest)
+        manifest.save()
 
-    def _dir_to_xml(self, dir_path):
+    def _dir_to_xml(self, dir_path, compact=False, sidecar_threshold=None, stream_xml=False, manifest=None):
         for root, dirs, files in os.walk(dir_path):
             for file_name in files:
                 if file_name.endswith((".scn", ".mesh")):
@@ -36,17 +75,17 @@ class LensPacker:
                     postfix = resource_ext.lstrip('.')
                     xml_file = os.path.join(resource_dir, f"_{resource_name}_{postfix}.xml")
 
-                    resource_to_xml(resource_file, xml_file)
+                    resource_to_xml(resource_file, xml_file, compact, sidecar_threshold, stream_xml)
+                    if manifest is not None:
+                        manifest.record_resource(manifest.lns_path(xml_file), manifest.lns_path(resource_file))
 
-    def _dir_to_resources(self, dir_path):
+    def _dir_to_resources(self, dir_path, manifest=None):
         pattern = r"^_.+\.xml$"
         for root, dirs, files in os.walk(dir_path):
             for file_name in files:
                 if re.match(pattern, file_name):
                     xml_file = os.path.join(root, file_name)
 
-                    self.log(f"Converting XML to Resource: {xml_file}")
-
                     xml_dir = os.path.dirname(xml_file)
                     xml_name = os.path.splitext(os.path.basename(xml_file))[0]
                     if xml_name.endswith("_scn"):
@@ -60,4 +99,14 @@ class LensPacker:
 
                     resource_file = os.path.join(xml_dir, f"{resource_name}{resource_ext}")
 
+                    if manifest is not None:
+                        xml_path = manifest.lns_path(xml_file)
+                        resource_path = manifest.lns_path(resource_file)
+                        if manifest.resource_unchanged(xml_path, resource_path):
+                            continue
+
+                    self.log(f"Converting XML to Resource: {xml_file}")
+
                     xml_to_resource(xml_file, resource_file)
+                    if manifest is not None:
+                        manifest.record_resource(xml_path, resource_path)
@@ -1,19 +1,17 @@
-import os
+import posixpath
 import re
-import shutil
-import tempfile
 
-from lxml import etree
-
-from .lens_packer import LensPacker
+from ..common.parser.lns_parser import LnsParser
+from ..common.parser.resource_parser import ResourceParser
+from ..common.types.enums import EventType, FieldType
+from ..tools.lns_tool import write_lns
 
 
 class LensPatcher:
     def __init__(self, log_function=print):
         self.log_function = log_function
-        self.packer = LensPacker(log_function)
-        self.temp_dir = None
-        self.temp_file = None
+        self.filename = None
+        self.files = None
 
     def __del__(self):
         self.close()
@@ -23,90 +21,93 @@ class LensPatcher:
             self.log_function(str)
 
     def open(self, input):
-        if self.temp_dir is not None:
+        if self.files is not None:
             raise Exception('Call close() method before opening another file.')
 
-        self.temp_dir = tempfile.mkdtemp()
-        self.temp_file = os.path.join(self.temp_dir, os.path.splitext(os.path.basename(input))[0])
-
-        self.log(f"Using Temp Dir: {self.temp_dir}")
+        self.log(f"Reading Lens: {input}")
 
-        self.packer.unpack(input, self.temp_file)
+        with LnsParser(input, use_mmap=True) as parser:
+            self.files = parser.parse()
+        self.filename = input
 
     def write(self, output):
-        temp_packed_file = f"{self.temp_file}.lns"
-        if os.path.exists(temp_packed_file):
-            os.remove(temp_packed_file)
+        if self.files is None:
+            raise Exception('No file has been opened.')
 
-        self.packer.pack(self.temp_file, temp_packed_file)
         self.log(f"Writing Lens to: {output}")
 
         try:
-            shutil.copy(temp_packed_file, output)
-        except FileNotFoundError as e:
-            self.log(f"Error copying file: {e}")
+            write_lns(output, self.files)
+        except OSError as e:
+            self.log(f"Error writing file: {e}")
         except Exception as e:
             self.log(f"General error: {e}")
 
     def close(self):
-        if self.temp_dir is not None:
-            self.log(f"Removing Temp Dir: {self.temp_dir}")
-
-            shutil.rmtree(self.temp_dir)
-            self.temp_dir = None
-            self.temp_file = None
+        self.files = None
+        self.filename = None
 
     def disable_fallback(self):
-        if self.temp_file is None:
+        if self.files is None:
             raise Exception('No file has been opened.')
 
-        self.log(f"Trying to disable LensMode Fallback on: {self.temp_file}")
+        self.log(f"Trying to disable LensMode Fallback on: {self.filename}")
 
-        xml_file = os.path.join(self.temp_file, f"_scene_scn.xml")
-        if not os.path.exists(xml_file) or not os.path.isfile(xml_file):
-            self.log(f"Could not find {xml_file}")
+        scene_file = "/scene.scn"
+        if scene_file not in self.files:
+            self.log(f"Could not find {scene_file}")
             return False
 
-        lens_mode_ctrl = self._find_lens_mode_controller_js(xml_file)
+        lens_mode_ctrl = self._find_lens_mode_controller_js(self.files[scene_file])
         if lens_mode_ctrl is None:
             self.log(f"Unable to detect LensModeController.js file")
             return False
 
-        lens_mode_ctrl_path = os.path.normpath(os.path.join(self.temp_file, lens_mode_ctrl))
+        lens_mode_ctrl_path = posixpath.normpath(posixpath.join("/", lens_mode_ctrl))
+        if lens_mode_ctrl_path not in self.files:
+            self.log(f"Could not find {lens_mode_ctrl_path}")
+            return False
+
         self.log(f"Found LensModeController: {lens_mode_ctrl}")
 
-        self._set_fallback_false(lens_mode_ctrl_path)
+        self.files[lens_mode_ctrl_path] = self._set_fallback_false(self.files[lens_mode_ctrl_path])
         self.log(f"LensMode Fallback has been disabled")
 
         return True
 
-    def _find_lens_mode_controller_js(self, scene_xml_file):
+    # find the fileinfo path of the block named after the target script, stops reading as soon as it is known
+    def _find_lens_mode_controller_js(self, scene_data):
         target_name = "Scripts/LensModeController.js"
-        target_path = None
-
-        tree = etree.parse(scene_xml_file)
-        root = tree.getroot()
-
-        for block in root.findall('.//block'):
-            name_element = block.find('./string[@key="name"]')
-
-            if name_element is not None and name_element.text == target_name:
-                fileinfo_element = block.find('.//block[@key="fileinfo"]')
-
-                if fileinfo_element is not None:
-                    path_element = fileinfo_element.find('./string[@key="path"]')
-
-                    if path_element is not None:
-                        target_path = path_element.text
-                        break
-
-        return target_path
 
-    def _set_fallback_false(self, lens_mode_ctrl_file):
-        with open(lens_mode_ctrl_file, 'r') as file:
-            code = file.read()
+        # [key, name, fileinfo path, fileinfo seen] per open block
+        stack = [[None, None, None, False]]
+        for event in ResourceParser(None, data=scene_data).iter_events():
+            if event.type is EventType.BEGIN:
+                stack.append([event.label, None, None, False])
+            elif event.type is EventType.VALUE and event.field_type in (FieldType.STRING, FieldType.STRINGV1):
+                block = stack[-1]
+                if event.label == "name" and block[1] is None:
+                    block[1] = event.value
+                elif event.label == "path" and block[0] == "fileinfo" and block[2] is None:
+                    block[2] = event.value
+            elif event.type is EventType.END:
+                block = stack.pop()
+                if block[1] == target_name and block[2] is not None and block[0] != "fileinfo":
+                    return block[2]
+                if block[0] == "fileinfo":
+                    for parent in stack:
+                        if not parent[3]:
+                            parent[3] = True
+                            parent[2] = block[2]
+                    for parent in stack:
+                        if parent[1] == target_name and parent[2] is not None:
+                            return parent[2]
+
+        return None
+
+    def _set_fallback_false(self, lens_mode_ctrl_data):
+        code = bytes(lens_mode_ctrl_data).decode()
 
         code = re.sub(r'(function setLensMode\(isFallback\)\s*{(\s*))', r'\1isFallback = false;\n\2', code, count=1)
 
-        with open(lens_mode_ctrl_file, 'w') as file:
-            file.write(code)
+        return code.encode()
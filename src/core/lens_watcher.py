@@ -0,0 +1,67 @@
+import os
+import time
+
+from .lens_manifest import MANIFEST_NAME
+from .lens_packer import LensPacker
+
+
+# polls an unpacked lens and repacks it once changes have settled. packing is incremental, so only
+# the xml resources which were edited get converted again.
+class LensWatcher:
+    def __init__(self, log_function=print):
+        self.log_function = log_function
+        self.packer = LensPacker(log_function)
+        self.running = False
+
+    def log(self, str):
+        if self.log_function:
+            self.log_function(str)
+
+    # blocks until stop() is called, debounce is how long the directory has to stay unchanged before packing
+    def watch(self, input_dir, output_file, interval=0.25, debounce=0.25, **pack_args):
+        self.running = True
+        ignored = {os.path.realpath(output_file), os.path.join(os.path.realpath(input_dir), MANIFEST_NAME)}
+        self.log(f"Watching Lens: {input_dir}")
+
+        snapshot = self._snapshot(input_dir, ignored)
+        changed_at = None
+        while self.running:
+            time.sleep(interval)
+            current = self._snapshot(input_dir, ignored)
+            if current != snapshot:
+                snapshot = current
+                changed_at = time.monotonic()
+            elif changed_at is not None and time.monotonic() - changed_at >= debounce:
+                changed_at = None
+                # snapshot is from before the pack, edits saved while it runs trigger another one. so do the
+                # resources it writes itself, that pack finds nothing changed through the manifest.
+                self.repack(input_dir, output_file, **pack_args)
+
+    def stop(self):
+        self.running = False
+
+    def repack(self, input_dir, output_file, **pack_args):
+        start = time.monotonic()
+        try:
+            self.packer.pack(input_dir, output_file, **pack_args)
+        except Exception as e:
+            # a file may be saved half way, the next change triggers another attempt
+            self.log(f"Error packing Lens: {e}")
+            return False
+        self.log(f"Packed Lens in {time.monotonic() - start:.2f}s: {output_file}")
+        return True
+
+    @staticmethod
+    def _snapshot(dirname, ignored):
+        snapshot = {}
+        for dirpath, dirnames, filenames in os.walk(os.path.realpath(dirname)):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                if full_path in ignored:
+                    continue
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+                snapshot[full_path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
@@ -1,37 +1,118 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
+from ..common.parser.lns_parser import LnsParser
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
 
 # Hash method from Boost
 def hash_combine(seed, value, dt=np.uint64):
     return seed ^ (value + dt(0x9e3779b9) + (seed << dt(6)) + (seed >> dt(2)))
 
 
+# same as hash_combine over a sequence of little endian uint64 words, on plain python ints
+def _hash_words(h, words):
+    for n in words:
+        h = (h ^ (n + 0x9e3779b9 + (h << 6) + (h >> 2))) & MASK64
+    return h
+
+
+def _words(data):
+    if sys.byteorder == "little":
+        return memoryview(data).cast("B").cast("Q")
+    words = array("Q")
+    words.frombytes(data)
+    words.byteswap()
+    return words
+
+
+class Hasher:
+    def __init__(self):
+        self.h = 0
+        self.size = 0
+        self.tail = b""
+
+    def update(self, data):
+        with memoryview(data) as view:
+            view = view.cast("B")
+            self.size += len(view)
+            if self.tail:
+                fill = min(8 - len(self.tail), len(view))
+                self.tail += view[:fill].tobytes()
+                view = view[fill:]
+                if len(self.tail) < 8:
+                    return
+                self.h = _hash_words(self.h, _words(self.tail))
+                self.tail = b""
+            end = len(view) - len(view) % 8
+            with view[:end] as aligned:
+                self.h = _hash_words(self.h, _words(aligned))
+            self.tail = view[end:].tobytes()
+
+    # the data is always zero padded, by a whole word when its size is a multiple of 8
+    def digest(self):
+        last = self.tail + bytes(8 - len(self.tail))
+        h = _hash_words(self.h, _words(last))
+        return np.uint64(_hash_words(h, [self.size]))
+
+
 def calc_hash(data):
-    dt = np.uint64
-    dtype = np.dtype(dt).newbyteorder("<")
-    padding = bytes(8 - (len(data) % 8))
+    hasher = Hasher()
+    hasher.update(data)
+    return hasher.digest()
 
-    np.seterr(over="ignore")
-    h = dt(0)
-    for n in np.frombuffer(data + padding, dtype):
-        h = hash_combine(h, n, dt)
-    h = hash_combine(h, dt(len(data)), dt)
-    np.seterr(over="warn")
 
-    return h
+def hash_file(filename, chunk_size=1 << 20):
+    hasher = Hasher()
+    with open(filename, "rb") as f:
+        chunk = f.read(chunk_size)
+        while chunk:
+            hasher.update(chunk)
+            chunk = f.read(chunk_size)
+    return hasher.digest()
+
+
+def _map(fn, items, max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(items) < 2:
+        return [fn(item) for item in items]
+    with ProcessPoolExecutor(max_workers) as executor:
+        return list(executor.map(fn, items, chunksize=max(1, len(items) // (4 * max_workers))))
+
+
+# hashes every file on a process pool, max_workers=1 stays in the calling process
+def hash_files(filenames, max_workers=None):
+    return dict(zip(filenames, _map(hash_file, list(filenames), max_workers)))
+
+
+def hash_archive(filename, max_workers=None):
+    with LnsParser(filename) as parser:
+        files = parser.parse(copy=True)
+    return dict(zip(files.keys(), _map(calc_hash, list(files.values()), max_workers)))
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Hash a file using Snapchat's hashing method")
-    parser.add_argument("input", help="input file")
+    parser.add_argument("input", nargs="+", help="input files")
+    parser.add_argument("-a", "--archive", action="store_true", help="hash every file inside the given lens archives")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
     args = parser.parse_args()
 
-    with open(args.input, "rb") as f:
-        data = f.read()
-
-    h = calc_hash(data)
-    print(h)
+    if args.archive:
+        for input in args.input:
+            for path, h in hash_archive(input, args.jobs).items():
+                print(f"{h} {input}:{path}")
+    elif len(args.input) == 1:
+        print(hash_file(args.input[0]))
+    else:
+        for input, h in hash_files(args.input, args.jobs).items():
+            print(f"{h} {input}")
@@ -3,22 +3,52 @@
 import argparse
 import os
 import re
+import struct
 
 import zstandard as zstd
 
+from ..common.parser.exceptions import ParserException
+from ..common.parser.lns_archive import LnsArchive
 from ..common.parser.lns_parser import LnsParser
 from ..common.util.binary_writer import BinaryWriter
 
 
-def extract(filename, output=None):
-    parser = LnsParser(filename)
-    files = parser.parse()
+def extract(filename, output=None, stream=False):
     if output is None:
         output_dir = os.path.dirname(filename)
         output_name = os.path.splitext(os.path.basename(filename))[0]
         output = os.path.join(output_dir, f"{output_name}_unpacked")
 
-    write_files(files, output)
+    if stream:
+        extract_stream(filename, output)
+    else:
+        parser = LnsParser(filename)
+        files = parser.parse()
+        write_files(files, output)
+
+
+# decompress entries in offset order and write each one out as it comes out of the zstd stream
+def extract_stream(filename, dirname):
+    with LnsArchive(filename, use_mmap=True) as archive:
+        os.mkdir(dirname)
+        entries = sorted(archive.entries.values(), key=lambda entry: entry.offset)
+        with archive.compressed_view() as zstd_data:
+            dctx = zstd.ZstdDecompressor()
+            stream = dctx.stream_reader(zstd_data)
+            for entry in entries:
+                # entries sharing data with a previous one need the stream to start over
+                if entry.offset < stream.tell():
+                    stream.close()
+                    stream = dctx.stream_reader(zstd_data)
+                stream.seek(entry.offset)
+
+                full_path = dirname + entry.path
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "wb") as f:
+                    if _copy_stream(stream, f, entry.size) != entry.size:
+                        raise ParserException(f"Truncated archive data for {entry.path}")
+            stream.close()
+            del stream
 
 
 def write_files(files, dirname):
@@ -31,62 +61,122 @@ def write_files(files, dirname):
             f.write(data)
 
 
-def create(dirname, output=None):
+def create(dirname, output=None, level=3, threads=0, long_distance=False):
     dirname = os.path.realpath(dirname)
-    files = read_files(dirname)
+    files = list_files(dirname)
     if output is None:
         output = f"{dirname}.lns"
 
-    write_lns(output, files)
+    write_lns_files(output, files, level, threads, long_distance)
 
 
-def read_files(dirname):
+# map lens paths to the files on disk which make up the archive
+def list_files(dirname):
     files = {}
     real_path = os.path.realpath(dirname)
-    pattern = r"^_.+\.xml$"
+    # xml resources, their "_<name>_<scn|mesh>.<n>.bin" sidecars and the unpack manifest in the top directory
+    # are not part of the archive
+    pattern = r"^_.+(\.xml|_(scn|mesh)\.\d+\.bin)$"
     for dirpath, dirnames, filenames in os.walk(real_path):
-        for filename in filenames:
+        dirnames.sort()
+        for filename in sorted(filenames):
             if re.match(pattern, filename):
                 continue
 
             full_path = dirpath + "/" + filename
             lns_path = full_path[len(real_path):].replace(os.sep, '/')
-            with open(full_path, "rb") as f:
-                files[lns_path] = f.read()
+            if lns_path == "/_manifest.json":
+                continue
+            files[lns_path] = full_path
+    return files
+
+
+def read_files(dirname):
+    files = {}
+    for lns_path, full_path in list_files(dirname).items():
+        with open(full_path, "rb") as f:
+            files[lns_path] = f.read()
     return files
 
 
-def write_lns(filename, files):
+# threads=-1 uses all logical cores, 0 compresses on the calling thread
+def make_compressor(level=3, threads=0, long_distance=False):
+    if long_distance:
+        params = zstd.ZstdCompressionParameters.from_level(level, threads=threads, enable_ldm=True)
+        return zstd.ZstdCompressor(compression_params=params)
+    return zstd.ZstdCompressor(level=level, threads=threads)
+
+
+def write_lns(filename, files, level=3, threads=0, long_distance=False):
+    entries = [(fname, len(fdata), fdata) for fname, fdata in files.items()]
+    _write_lns(filename, entries, level, threads, long_distance)
+
+
+# same as write_lns but takes file paths, entries are streamed from disk into the compressor
+def write_lns_files(filename, files, level=3, threads=0, long_distance=False):
+    entries = [(fname, os.path.getsize(path), path) for fname, path in files.items()]
+    _write_lns(filename, entries, level, threads, long_distance)
+
+
+def _write_lns(filename, entries, level, threads, long_distance):
     fname_writer = BinaryWriter()
-    fdata_writer = BinaryWriter()
-    for fname, fdata in files.items():
-        fname_writer.write_uint32(len(fname))
-        fname_writer.write_string(fname)
+    fdata_size = 0
+    for fname, fsize, _ in entries:
+        encoded_fname = fname.encode()
+        fname_writer.write_uint32(len(encoded_fname))
+        fname_writer.write_bytes(encoded_fname)
         fname_writer.write_uint32(0)
-        fname_writer.write_uint32(len(fdata))
-        fname_writer.write_uint32(fdata_writer.size)  # offset
-        fdata_writer.write_bytes(fdata)
-
-    cctx = zstd.ZstdCompressor()
-    compressed = cctx.compress(fdata_writer.get_bytes())
+        fname_writer.write_uint32(fsize)
+        fname_writer.write_uint32(fdata_size)  # offset
+        fdata_size += fsize
 
+    # the compressed size is unknown until the payload has been written, both fields are patched afterwards
+    header_size = 0x48 + fname_writer.size
     lns_writer = BinaryWriter()
     lns_writer.write_bytes(b"LZC\0")
     lns_writer.write_uint32(1)
-    lns_writer.write_uint32(len(files))
-    lns_writer.write_uint32(0x48 + fname_writer.size)  # header size
+    lns_writer.write_uint32(len(entries))
+    lns_writer.write_uint32(header_size)
     lns_writer.write_uint32(1)
     lns_writer.write_uint32(1)
-    lns_writer.write_uint32(fdata_writer.size)
-    lns_writer.write_uint32(len(compressed))
+    lns_writer.write_uint32(fdata_size)
+    compressed_size_offsets = [lns_writer.reserve()]
     lns_writer.write_bytes(bytes(32))
     lns_writer.write_uint32(2)
     lns_writer.write_uint32(fname_writer.size)
-    lns_writer.write_bytes(fname_writer.get_bytes())
+    lns_writer.write_bytes(fname_writer.getbuffer())
     lns_writer.write_uint32(1)
-    lns_writer.write_uint32(len(compressed))
-    lns_writer.write_bytes(compressed)
-    lns_writer.to_file(filename)
+    compressed_size_offsets.append(lns_writer.reserve())
+
+    cctx = make_compressor(level, threads, long_distance)
+    with open(filename, "wb") as f:
+        with lns_writer.getbuffer() as header:
+            f.write(header)
+        with cctx.stream_writer(f, size=fdata_size, closefd=False) as compressor:
+            for fname, fsize, fdata in entries:
+                if isinstance(fdata, str):
+                    with open(fdata, "rb") as src:
+                        written = _copy_stream(src, compressor)
+                else:
+                    written = compressor.write(fdata)
+                if written != fsize:
+                    raise ValueError(f"Size of {fname} changed while writing the archive")
+
+        compressed_size = struct.pack("<I", f.tell() - lns_writer.size)
+        for offset in compressed_size_offsets:
+            f.seek(offset)
+            f.write(compressed_size)
+
+
+def _copy_stream(src, dst, size=None, chunk_size=1 << 20):
+    written = 0
+    while size is None or written < size:
+        chunk = src.read(chunk_size if size is None else min(chunk_size, size - written))
+        if not chunk:
+            break
+        dst.write(chunk)
+        written += len(chunk)
+    return written
 
 
 if __name__ == '__main__':
@@ -95,9 +185,14 @@ if __name__ == '__main__':
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("-x", "--extract", action="store_true", help="extract an archive")
     group.add_argument("-c", "--create", action="store_true", help="create an archive")
+    parser.add_argument("-s", "--stream", action="store_true", help="extract entries straight to disk while decompressing")
+    parser.add_argument("-l", "--level", type=int, default=3, help="zstd compression level (default: 3)")
+    parser.add_argument("-T", "--threads", type=int, default=0,
+                        help="zstd worker threads, -1 for all cores (default: 0)")
+    parser.add_argument("--long", action="store_true", help="enable zstd long distance matching")
     args = parser.parse_args()
 
     if args.extract:
-        extract(args.input)
+        extract(args.input, stream=args.stream)
     elif args.create:
-        create(args.input)
+        create(args.input, level=args.level, threads=args.threads, long_distance=args.long)
@@ -1,16 +1,93 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
+from contextlib import ExitStack
+from functools import partial
 
+import numpy as np
 from lxml import etree as ET
 
-from ..common.parser.resource_parser import ResourceParser
+from ..common.parser.resource_parser import ResourceParser, field_type_to_tag
+from ..common.types.enums import EventType
 from ..common.serializer.resource_serializer import ResourceSerializer
 from ..common.util.binary_reader import BinaryReader, BinaryReaderError
 
 
+# formats single fields as elements, shared by XmlResourceBuilder and XmlResourceWriter.
+# compact writes vectors and matrices as a single space separated text node instead of one element per component.
+# byte arrays of at least sidecar_threshold bytes are written to "<sidecar_prefix>.<n>.bin" instead of inline hex.
+class XmlFieldFormatter:
+    def __init__(self, compact=False, sidecar_prefix=None, sidecar_threshold=None):
+        self.compact = compact
+        self.sidecar_prefix = sidecar_prefix
+        self.sidecar_threshold = sidecar_threshold
+
+    def value_element(self, key, value, tag, sub_tag=None):
+        el = ET.Element(tag, key=key)
+        if sub_tag is None:
+            # scalars are read as python floats, format them with float32 precision
+            el.text = str(np.float32(value) if tag == "float32" else value)
+        elif self.compact:
+            el.text = " ".join(map(str, value))
+        else:
+            for n in value:
+                sub_el = ET.SubElement(el, sub_tag)
+                sub_el.text = str(n)
+        return el
+
+    # plain byte arrays are the ones whose element count is their byte size
+    def uses_sidecar(self, true_size, size):
+        return true_size == size and self.sidecar_prefix is not None and self.sidecar_threshold is not None \
+            and true_size >= self.sidecar_threshold
+
+    # sidecar_number is the n of the sidecar file, for arrays where uses_sidecar() is true
+    def fill_array(self, el, raw, size, offset, sidecar_number=None):
+        true_size = len(raw)
+        if true_size == size:
+            if self.uses_sidecar(true_size, size):
+                el.set("file", self.write_sidecar(raw, sidecar_number))
+            else:
+                el.text = raw.hex()
+        else:
+            el.tag = "array"
+            reader = BinaryReader(raw)
+            strings = []
+            is_string_array = True
+
+            # try to read array as strings, and deem it not a string array if it fails
+            try:
+                for _ in range(size):
+                    string_len = reader.read_uint32()
+                    string = reader.read_string(string_len)
+                    strings.append(string)
+                is_string_array = reader.finished()
+            except (UnicodeDecodeError, BinaryReaderError) as e:
+                is_string_array = False
+
+            if is_string_array:
+                for string in strings:
+                    sub_el = ET.SubElement(el, "string")
+                    sub_el.text = string
+            elif true_size % size != 0:
+                raise ValueError(f"Failed to infer array structure at offset {offset}")
+            else:
+                reader.seek(0)
+                while not reader.finished():
+                    sub_el = ET.SubElement(el, "bytes")
+                    sub_el.text = reader.read_bytes(true_size // size).hex()
+
+    # returns the sidecar path relative to the xml file
+    def write_sidecar(self, raw, number):
+        sidecar_file = f"{self.sidecar_prefix}.{number}.bin"
+        with open(sidecar_file, "wb") as f:
+            f.write(raw)
+        return os.path.basename(sidecar_file)
+
+
 class XmlResourceBuilder:
-    def __init__(self):
+    def __init__(self, compact=False, sidecar_prefix=None, sidecar_threshold=None):
+        self.formatter = XmlFieldFormatter(compact, sidecar_prefix, sidecar_threshold)
         self.root = ET.Element("resource")
         self.stack = [self.root]
         self.arrays = []
@@ -26,14 +103,8 @@ class XmlResourceBuilder:
     def finish_block(self):
         self.parent = self.stack.pop()
 
-    def add_value(self, key, value, tag, sub_tag=None):
-        el = ET.SubElement(self.parent, tag, key=key)
-        if sub_tag is None:
-            el.text = str(value)
-        else:
-            for n in value:
-                sub_el = ET.SubElement(el, sub_tag)
-                sub_el.text = str(n)
+    def add_value(self, key, value, tag, sub_tag=None, offset=None):
+        self.parent.append(self.formatter.value_element(key, value, tag, sub_tag))
 
     def add_array(self, key, offset, size):
         el = ET.SubElement(self.parent, "bytes", key=key)
@@ -42,6 +113,7 @@ class XmlResourceBuilder:
     # infer whether an array contains bytes, strings, or something else
     def infer_arrays(self, data, header_size):
         self.arrays.sort(key=lambda x: x[0])
+        sidecar_count = 0
         for (offset, size, el), i in zip(self.arrays, range(len(self.arrays))):
             # "size" represents the number of elements (of unknown length) in the array
             # "true size" is the number of bytes in the array
@@ -51,54 +123,155 @@ class XmlResourceBuilder:
                 true_size = self.arrays[i + 1][0] - offset
 
             raw = data[header_size + offset:header_size + offset + true_size]
-
-            if true_size == size:
-                el.text = raw.hex()
-            else:
-                el.tag = "array"
-                reader = BinaryReader(raw)
-                strings = []
-                is_string_array = True
-
-                # try to read array as strings, and deem it not a string array if it fails
-                try:
-                    for _ in range(size):
-                        string_len = reader.read_uint32()
-                        string = reader.read_string(string_len)
-                        strings.append(string)
-                    is_string_array = reader.finished()
-                except (UnicodeDecodeError, BinaryReaderError) as e:
-                    is_string_array = False
-
-                if is_string_array:
-                    for string in strings:
-                        sub_el = ET.SubElement(el, "string")
-                        sub_el.text = string
-                elif true_size % size != 0:
-                    raise ValueError(f"Failed to infer array structure at offset {header_size + offset}")
-                else:
-                    reader.seek(0)
-                    while not reader.finished():
-                        sub_el = ET.SubElement(el, "bytes")
-                        sub_el.text = reader.read_bytes(true_size // size).hex()
+            sidecar_number = None
+            if self.formatter.uses_sidecar(true_size, size):
+                sidecar_number = sidecar_count
+                sidecar_count += 1
+            self.formatter.fill_array(el, raw, size, header_size + offset, sidecar_number)
 
     def finished(self):
         return len(self.stack) == 0
 
 
-def resource_to_xml(filename, outfile):
+# writes the same document as XmlResourceBuilder, element by element while the resource is read.
+# only one field is held in memory at a time, fields are formatted by the same XmlFieldFormatter.
+class XmlResourceWriter:
+    INDENT = "  "
+    # libxml2 pretty printing stops indenting at 60 characters, deeper elements keep that indent
+    MAX_INDENT_DEPTH = 30
+
+    def __init__(self, compact=False, sidecar_prefix=None, sidecar_threshold=None):
+        self.formatter = XmlFieldFormatter(compact, sidecar_prefix, sidecar_threshold)
+
+    # array contents depend on where the next array starts, so the array offsets are collected up front
+    def _scan_arrays(self, parser):
+        offsets = []
+        sizes = []
+        for event in parser.iter_events(decode_values=False):
+            if event.type is EventType.ARRAY:
+                offsets.append(event.value)
+                sizes.append(event.size)
+
+        data_size = len(parser.reader.data) - parser.header_size
+        order = sorted(range(len(offsets)), key=offsets.__getitem__)
+        true_sizes = [0] * len(offsets)
+        sidecar_numbers = [None] * len(offsets)
+        sidecar_count = 0
+        for i, index in enumerate(order):
+            next_offset = offsets[order[i + 1]] if i + 1 < len(order) else data_size
+            true_sizes[index] = next_offset - offsets[index]
+            if self.formatter.uses_sidecar(true_sizes[index], sizes[index]):
+                sidecar_numbers[index] = sidecar_count
+                sidecar_count += 1
+        return true_sizes, sidecar_numbers
+
+    def write(self, parser, outfile):
+        true_sizes, sidecar_numbers = self._scan_arrays(parser)
+        parser.reader.seek(0)
+        events = parser.iter_events()
+        data = parser.reader.data
+
+        with open(outfile, "wb") as f:
+            with ET.xmlfile(f, encoding="ASCII") as xf, ExitStack() as exit_stack:
+                # [ExitStack of the element, has children] for every open element, the root is handled like any block
+                stack = []
+                # elements still open when writing fails are closed with the error
+                exit_stack.push(partial(self._close_all, stack))
+                pending_block = ET.Element("resource")
+                array_index = 0
+                for event in events:
+                    if pending_block is not None:
+                        if event.type is EventType.END:
+                            self._write_child(xf, stack, pending_block)
+                            pending_block = None
+                            continue
+                        self._open_child(xf, stack, pending_block)
+                        pending_block = None
+
+                    if event.type is EventType.BEGIN:
+                        pending_block = ET.Element("block")
+                        if event.label is not None:
+                            pending_block.set("key", event.label)
+                    elif event.type is EventType.END:
+                        self._close(xf, stack)
+                    elif event.type is EventType.VALUE:
+                        tag, sub_tag = field_type_to_tag[event.field_type]
+                        self._write_child(xf, stack, self.formatter.value_element(event.label, event.value, tag, sub_tag))
+                    else:
+                        el = ET.Element("bytes", key=event.label)
+                        offset = parser.header_size + event.value
+                        raw = data[offset:offset + true_sizes[array_index]]
+                        self.formatter.fill_array(el, raw, event.size, offset, sidecar_numbers[array_index])
+                        array_index += 1
+                        self._write_child(xf, stack, el)
+            f.write(b"\n")
+
+    @staticmethod
+    def _close_all(stack, exc_type, exc_value, traceback):
+        while stack:
+            element, has_children = stack.pop()
+            element.__exit__(exc_type, exc_value, traceback)
+        return False
+
+    def _newline(self, depth):
+        return "\n" + self.INDENT * min(depth, self.MAX_INDENT_DEPTH)
+
+    def _indent(self, xf, stack):
+        if not stack:
+            return
+        stack[-1][1] = True
+        xf.write(self._newline(len(stack)))
+
+    def _open_child(self, xf, stack, el):
+        self._indent(xf, stack)
+        element = ExitStack()
+        element.enter_context(xf.element(el.tag, el.attrib))
+        stack.append([element, False])
+
+    def _close(self, xf, stack):
+        element, has_children = stack.pop()
+        if has_children:
+            xf.write(self._newline(len(stack)))
+        element.close()
+
+    # writes an element with pretty printed children at the current depth
+    def _write_child(self, xf, stack, el):
+        if len(el) == 0:
+            self._indent(xf, stack)
+            xf.write(el)
+            return
+        self._open_child(xf, stack, el)
+        for child in el:
+            self._write_child(xf, stack, child)
+        self._close(xf, stack)
+
+
+def resource_to_xml(filename, outfile, compact=False, sidecar_threshold=None, stream=False):
     parser = ResourceParser(filename)
-    xml = parser.parse(XmlResourceBuilder)
+    sidecar_prefix = os.path.splitext(outfile)[0]
+    if stream:
+        XmlResourceWriter(compact, sidecar_prefix, sidecar_threshold).write(parser, outfile)
+        return
+
+    xml = parser.parse(partial(XmlResourceBuilder, compact=compact, sidecar_prefix=sidecar_prefix,
+                               sidecar_threshold=sidecar_threshold))
     xml = ET.ElementTree(xml)
     xml.write(outfile, pretty_print=True)
 
 
-def _xml_to_resource_rec(serializer, node):
+# vector components are either child elements or a single space separated text node
+def _xml_values(node):
+    if len(node) == 0:
+        return [] if node.text is None else node.text.split()
+    return [child.text for child in node]
+
+
+def _xml_to_resource_rec(serializer, node, base_dir=""):
     key = node.attrib["key"] if "key" in node.attrib else None
     if node.tag == "block":
         serializer.begin(key)
         for child in node:
-            _xml_to_resource_rec(serializer, child)
+            _xml_to_resource_rec(serializer, child, base_dir)
         serializer.end()
     elif node.tag == "bool8":
         if node.text.lower() == "true":
@@ -108,6 +281,9 @@ def _xml_to_resource_rec(serializer, node):
         else:
             raise ValueError("Unexpected value for bool8")
         serializer.write_bool8(key, value)
+    elif node.tag == "bytes" and "file" in node.attrib:
+        with open(os.path.join(base_dir, node.attrib["file"]), "rb") as f:
+            serializer.write_bytes(key, f.read())
     elif node.tag == "bytes":
         value = "" if node.text is None else node.text
         value = bytes.fromhex(value)
@@ -125,31 +301,31 @@ def _xml_to_resource_rec(serializer, node):
     elif node.tag == "int64":
         serializer.write_int64(key, node.text)
     elif node.tag == "mat2f":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_mat2f(key, values)
     elif node.tag == "mat3f":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_mat3f(key, values)
     elif node.tag == "mat4f":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_mat4f(key, values)
     elif node.tag == "quatf":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_quatf(key, values)
     elif node.tag == "string":
         value = "" if node.text is None else node.text
         serializer.write_string(key, value)
     elif node.tag == "vec2f":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_vec2f(key, values)
     elif node.tag == "vec3f":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_vec3f(key, values)
     elif node.tag == "vec4f":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_vec4f(key, values)
     elif node.tag == "vec4b":
-        values = [child.text for child in node]
+        values = _xml_values(node)
         serializer.write_vec4b(key, values)
     elif node.tag == "array":
         if len(node) == 0:
@@ -173,13 +349,36 @@ def _xml_to_resource_rec(serializer, node):
         raise ValueError("Tag not recognized: " + node.tag)
 
 
+# blocks are serialized as they open and close, every other field once its element is complete
 def xml_to_resource(filename, outfile=None):
-    with open(filename, "rb") as f:
-        xml = ET.parse(f)
     serializer = ResourceSerializer()
+    base_dir = os.path.dirname(filename)
+
+    # True for every open element which holds fields (the root and blocks), False for fields and their contents
+    containers = []
+    for action, node in ET.iterparse(filename, events=("start", "end"), huge_tree=True):
+        if action == "start":
+            if not containers:
+                containers.append(True)
+            elif containers[-1] and node.tag == "block":
+                serializer.begin(node.get("key"))
+                containers.append(True)
+            else:
+                containers.append(False)
+            continue
+
+        is_container = containers.pop()
+        if not containers or not containers[-1]:
+            continue
+        if is_container:
+            serializer.end()
+        else:
+            _xml_to_resource_rec(serializer, node, base_dir)
 
-    for child in xml.getroot():
-        _xml_to_resource_rec(serializer, child)
+        # finished fields are dropped so memory stays bounded by the nesting depth
+        node.clear()
+        while node.getprevious() is not None:
+            del node.getparent()[0]
 
     serializer.finalize()
     serializer.to_file(outfile)
@@ -192,9 +391,15 @@ if __name__ == '__main__':
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("-r", "--resource", action="store_true", help="convert resource file to xml")
     group.add_argument("-x", "--xml", action="store_true", help="convert xml to resource file")
+    parser.add_argument("-c", "--compact", action="store_true",
+                        help="write vectors and matrices as a single text node (resource to xml only)")
+    parser.add_argument("-s", "--sidecar", type=int, metavar="BYTES",
+                        help="write byte arrays of at least BYTES bytes to .bin files next to the xml (resource to xml only)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write the xml while reading the resource instead of building the whole tree (resource to xml only)")
     args = parser.parse_args()
 
     if args.resource:
-        resource_to_xml(args.input, args.output)
+        resource_to_xml(args.input, args.output, args.compact, args.sidecar, args.stream)
     elif args.xml:
         xml_to_resource(args.input, args.output)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from ..core.lens_watcher import LensWatcher
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Repack an unpacked Snapchat lens whenever its files change")
+    parser.add_argument("input", help="unpacked lens directory")
+    parser.add_argument("output", nargs="?", help="lens archive to write (default: <input>.lns)")
+    parser.add_argument("-i", "--interval", type=float, default=0.25, help="seconds between polls (default: 0.25)")
+    parser.add_argument("-d", "--debounce", type=float, default=0.25,
+                        help="seconds without further changes before repacking (default: 0.25)")
+    parser.add_argument("-l", "--level", type=int, default=3, help="zstd compression level (default: 3)")
+    parser.add_argument("-T", "--threads", type=int, default=0,
+                        help="zstd worker threads, -1 for all cores (default: 0)")
+    args = parser.parse_args()
+
+    output = args.output or f"{args.input.rstrip('/')}.lns"
+    watcher = LensWatcher()
+    try:
+        watcher.watch(args.input, output, args.interval, args.debounce, level=args.level, threads=args.threads)
+    except KeyboardInterrupt:
+        pass